@@ -8,58 +8,225 @@ This application provides:
 2. Brand-specific size recommendations
 """
 
-import gradio as gr
-import pandas as pd
+# Heavy dependencies (gradio, pandas, sklearn, fastapi) are imported where they
+# are first needed so that importing this module stays fast
 import numpy as np
-from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-from sklearn.metrics import r2_score, accuracy_score
 import json
 import logging
+import math
+import os
+import random
+import re
+import threading
+import time
 from datetime import datetime
+from typing import Optional
+
+import metrics
+import static_assets
+from flat_forest import FlatForest, model_memory
+from height_table import HeightLookupTable
+from logging_setup import configure_logging
+from micro_batcher import MicroBatcher
+from prefork import PreforkServer
+from model_store import ModelStore, appended_since, data_checkpoint, fingerprint
+from result_cache import ResultCache, quantize
+from file_watcher import FileWatcher
+from size_index import load_size_index
 
 # Constants
 # Constants
 CURRENT_TIME = "2025-02-22 21:39:09"
 CURRENT_USER = "RohanVashisht1234"
 CSV_PATH = 'bdm.csv'
+# Training data: a CSV file, a Parquet file, or a directory of Parquet partitions
+DATA_PATH = os.environ.get("DATA_PATH", CSV_PATH)
 SHIRT_SIZE_CHARTS_PATH = 'shirt_size_charts.json'
 PANTS_SIZE_CHARTS_PATH = 'pants_size_charts.json'
+# Output of AIModel/asset_pipeline.py and the level of detail shown in the UI (0 is the finest)
+ASSET_BUILD_DIR = os.environ.get("ASSET_BUILD_DIR", 'assets_build')
+ASSET_LOD = int(os.environ.get("ASSET_LOD", "1"))
+# Seconds between checks of the size chart files for changes; 0 disables hot-reloading
+CHART_WATCH_INTERVAL = float(os.environ.get("CHART_WATCH_INTERVAL", "2"))
+SHIRT_SIZE_DIMENSIONS = ['chest', 'waist', 'shoulder']
+PANTS_SIZE_DIMENSIONS = ['waist', 'hips', 'leg_length']
+# Predicted measurement columns fed to each garment's size finder, in its argument order
+SHIRT_SIZE_COLUMNS = {'chest': 'ChestWidth', 'waist': 'Waist', 'shoulder': 'ShoulderWidth'}
+PANTS_SIZE_COLUMNS = {'waist': 'Waist', 'leg_length': 'LegLength', 'hips': 'Hips'}
+# Pants sizes also match measurements up to ±2cm outside their ranges
+PANTS_SIZE_TOLERANCE = 2
+MODEL_STORE_DIR = os.environ.get("MODEL_STORE_DIR", 'model_store')
+MODEL_PARAMS = {"n_estimators": 100, "random_state": 42}
+# Optional forest compaction, see compact_models.py: fewer trees, capped depth, cost-complexity pruning
+if os.environ.get("FOREST_N_ESTIMATORS"):
+    MODEL_PARAMS["n_estimators"] = int(os.environ["FOREST_N_ESTIMATORS"])
+if os.environ.get("FOREST_MAX_DEPTH"):
+    MODEL_PARAMS["max_depth"] = int(os.environ["FOREST_MAX_DEPTH"])
+if os.environ.get("FOREST_CCP_ALPHA"):
+    MODEL_PARAMS["ccp_alpha"] = float(os.environ["FOREST_CCP_ALPHA"])
+# "random_forest" (default) or "extra_trees", see evaluate_models.py for choosing one
+if os.environ.get("FOREST_FAMILY"):
+    MODEL_PARAMS["family"] = os.environ["FOREST_FAMILY"]
+# "sklearn" serves the fitted estimators, "flat" converts them to array-backed FlatForests after loading
+MODEL_FORMAT = os.environ.get("MODEL_FORMAT", "sklearn")
+# "forest" runs the fitted forests per request, "compiled" answers from an exact height lookup table
+PREDICTOR_MODE = os.environ.get("PREDICTOR_MODE", "forest")
+# "per_column" fits one forest per target, "multi_output" one regressor and one joint classifier per garment
+MODEL_LAYOUT = os.environ.get("MODEL_LAYOUT", "per_column")
+# CPU budget for training: independent targets fit in parallel processes, trees in parallel threads
+TRAINING_WORKERS = int(os.environ.get("TRAINING_WORKERS", os.cpu_count() or 1))
+# When rows are appended to the training data, refresh the stored models by
+# replacing part of each forest's trees instead of retraining from scratch
+INCREMENTAL_TRAINING = os.environ.get("INCREMENTAL_TRAINING", "1") == "1"
+# Smallest share of each forest's trees refit on a refresh; larger appends refit proportionally more
+INCREMENTAL_TREE_FRACTION = float(os.environ.get("INCREMENTAL_TREE_FRACTION", "0.1"))
+# Largest accuracy drop of a refresh below the previous models, scored on the same rows,
+# tolerated before it falls back to a full retrain
+MAX_ACCURACY_DRIFT = float(os.environ.get("MAX_ACCURACY_DRIFT", "0.02"))
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Input step sizes of the UI; inputs on these grids share cache entries (see quantize)
+HEIGHT_STEP = 1
+WEIGHT_STEP = 0.1
+MEASUREMENT_STEP = 0.5
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "4096"))
+RESULT_CACHE_TTL = float(os.environ["RESULT_CACHE_TTL"]) if os.environ.get("RESULT_CACHE_TTL") else None
+# Prometheus-style request, error and latency metrics served at /metrics
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+# "text" keeps the classic log lines, "json" writes one structured object per record
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text")
+# Share of size-matching calls that log a DEBUG trace of every matched size
+SIZE_TRACE_SAMPLE_RATE = float(os.environ.get("SIZE_TRACE_SAMPLE_RATE", "0.01"))
+# HTTP worker processes; with more than one, models are loaded once and shared by forked workers
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", "1"))
+# Forest predictions arriving while a batch runs (up to the batch size) are answered
+# together with one model call per column; an idle batcher runs a request at once
+# unless BATCH_WINDOW_MS makes it wait for company. Compiled predictors never batch.
+MICRO_BATCHING = os.environ.get("MICRO_BATCHING", "1") == "1"
+BATCH_WINDOW = float(os.environ.get("BATCH_WINDOW_MS", "0")) / 1000
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "64"))
+# Gradio events running measurement predictions at once, so concurrent clicks reach the
+# micro-batcher together instead of queueing one by one
+PREDICTION_CONCURRENCY = BATCH_MAX_SIZE
+
+# Set up logging; records are formatted and written by a background thread
+configure_logging(logging.INFO, LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+# Set up metrics
+metrics.set_enabled(METRICS_ENABLED)
+REQUESTS = metrics.REGISTRY.counter(
+    "predictor_requests_total", "Predictor calls by endpoint", ["endpoint"]
+)
+ERRORS = metrics.REGISTRY.counter(
+    "predictor_errors_total", "Predictor calls answered with an error payload", ["endpoint", "error"]
+)
+REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    "predictor_request_seconds", "Latency of predictor calls, cache lookups included", ["endpoint"]
+)
+STAGE_SECONDS = metrics.REGISTRY.histogram(
+    "predictor_stage_seconds", "Latency of each stage of a prediction", ["predictor", "stage"]
+)
+INFERENCE_SECONDS = metrics.REGISTRY.histogram(
+    "model_inference_seconds", "Latency of a single fitted model's predict call", ["model"]
+)
+MODEL_LOAD_SECONDS = metrics.REGISTRY.histogram(
+    "model_load_seconds", "Duration of loading, training or refreshing models and size charts", ["model", "source"]
+)
+BATCH_SIZES = metrics.REGISTRY.histogram(
+    "predictor_batch_size", "Requests answered by one micro-batched prediction", ["predictor"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
 
 
-class ShirtPredictor:
-    def __init__(self):
+def read_training_data(path, columns):
+    """Load only the needed columns from a CSV file or from Parquet output of the prep pipeline"""
+    import pandas as pd
+    
+    if os.path.isdir(path) or path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+
+class MeasurementModels:
+    """
+    Training layer behind the garment predictors: loads the dataset once,
+    fits one scaler and trains every target column exactly once, however
+    many predictors read from it.
+    """
+
+    def __init__(self, categorical_columns, numerical_columns, layout=MODEL_LAYOUT, name='measurements'):
+        from sklearn.preprocessing import StandardScaler
+        
+        self.name = name
         self.models = {}
         self.encoders = {}
         self.scaler = StandardScaler()
-        self.categorical_columns = ['Size', 'Fit']
-        self.numerical_columns = [
-            'ChestWidth', 'ShoulderWidth', 'ArmLength',
-            'ShoulderToWaist', 'Belly', 'Waist'
-        ]
+        self.categorical_columns = list(categorical_columns)
+        self.numerical_columns = list(numerical_columns)
         self.accuracies = {}
-        self.units = {
-            'ChestWidth': 'cm',
-            'ShoulderWidth': 'cm',
-            'ArmLength': 'cm',
-            'ShoulderToWaist': 'cm',
-            'Belly': 'cm',
-            'Waist': 'cm',
-            'Weight': 'kg',
-            'TotalHeight': 'cm'
-        }
+        # Accuracies of the last full retrain, and how far the last incremental refresh moved
+        # accuracy against the models it replaced
+        self.full_accuracies = {}
+        self.drift = {}
+        self.checkpoint = None
+        self.timings = {}
+        self.params = dict(MODEL_PARAMS)
+        self.layout = layout
+        self.listeners = []
     
-    def train(self):
-        logger.info("Loading and preparing data...")
-        df = pd.read_csv(CSV_PATH)
+    @classmethod
+    def shared(cls, predictors, layout=MODEL_LAYOUT):
+        """One model set covering the union of the predictors' columns"""
+        categorical_columns, numerical_columns = [], []
+        for predictor in predictors:
+            categorical_columns += [c for c in predictor.categorical_columns if c not in categorical_columns]
+            numerical_columns += [c for c in predictor.numerical_columns if c not in numerical_columns]
+        model_set = cls(categorical_columns, numerical_columns, layout)
+        for predictor in predictors:
+            predictor.use_model_set(model_set)
+        return model_set
+    
+    def train(self, workers=None):
+        from training import fit_targets
+        
+        logger.info("Loading and preparing %s prediction models...", self.name)
+        start = time.perf_counter()
+        checkpoint = data_checkpoint(DATA_PATH)
+        df, X_scaled, targets = self.training_data()
+        
+        workers = TRAINING_WORKERS if workers is None else workers
+        results = fit_targets(
+            {name: (kind, X_scaled, y) for name, (kind, _, y) in targets.items()},
+            self.params, workers
+        )
+        
+        self.timings = {}
+        for name, (model, scores, seconds) in results.items():
+            self.models[name] = model
+            self.timings[name] = round(seconds, 3)
+            for col, score in zip(targets[name][1], scores):
+                self.accuracies[col] = score
+        self.timings["total"] = round(time.perf_counter() - start, 3)
+        
+        logger.info(
+            "%s prediction models trained successfully in %ss with %s workers (%s)",
+            self.name.capitalize(), self.timings["total"], workers,
+            ", ".join(f"{name}: {seconds}s" for name, seconds in self.timings.items() if name != "total")
+        )
+        self.full_accuracies = dict(self.accuracies)
+        self.drift = {}
+        self.checkpoint = {"rows": len(df), "data": checkpoint}
+        self._models_changed()
+    
+    def training_data(self):
+        """
+        Read the dataset and fit the scaler and label encoders on it; returns
+        the rows, the scaled features and the training targets by model name
+        """
+        from sklearn.preprocessing import LabelEncoder
+        
+        df = self._read_data()
         
         # Prepare input features
         base_features = ['TotalHeight']
@@ -67,27 +234,356 @@ class ShirtPredictor:
         self.scaler.fit(X)
         X_scaled = self.scaler.transform(X)
         
-        # Train models for categorical columns
         for col in self.categorical_columns:
             self.encoders[col] = LabelEncoder()
-            encoded_values = self.encoders[col].fit_transform(df[col])
-            self.models[col] = RandomForestClassifier(n_estimators=100, random_state=42)
-            self.models[col].fit(X_scaled, encoded_values)
-            predictions = self.models[col].predict(X_scaled)
-            self.accuracies[col] = round(accuracy_score(encoded_values, predictions), 4)
+        encoded = {col: self.encoders[col].fit_transform(df[col]) for col in self.categorical_columns}
+        return df, X_scaled, self._targets(df, encoded)
+    
+    def _read_data(self):
+        return read_training_data(
+            DATA_PATH, ['TotalHeight'] + self.categorical_columns + self.numerical_columns
+        )
+    
+    def _targets(self, df, encoded):
+        """Training targets by model name: (estimator kind, columns, values)"""
+        if self.layout == "multi_output":
+            # One joint classifier for all categorical columns and one regressor for all numerical ones
+            return {
+                "categorical": ("classifier", self.categorical_columns,
+                                np.column_stack([encoded[col] for col in self.categorical_columns])),
+                "numerical": ("regressor", self.numerical_columns, df[self.numerical_columns].values)
+            }
+        targets = {col: ("classifier", [col], encoded[col]) for col in self.categorical_columns}
+        targets.update({col: ("regressor", [col], df[col].values) for col in self.numerical_columns})
+        return targets
+    
+    def update(self, artifact, workers=None):
+        """
+        Refresh the models of a stored artifact with rows appended since it was
+        trained by refitting the oldest trees of every forest on all rows.
+        Returns False, leaving a full retrain to the caller, when the data was
+        not just appended to, has new labels, or accuracy drifts too far below
+        the previous models scored on the same rows.
+        """
+        from training import replace_trees, score_target
         
-        # Train models for numerical columns
-        for col in self.numerical_columns:
-            self.models[col] = RandomForestRegressor(n_estimators=100, random_state=42)
-            self.models[col].fit(X_scaled, df[col])
-            predictions = self.models[col].predict(X_scaled)
-            self.accuracies[col] = round(r2_score(df[col], predictions), 4)
+        checkpoint = artifact.get("checkpoint")
+        if artifact.get("config") != self.config() or checkpoint is None:
+            return False
+        if not appended_since(DATA_PATH, checkpoint["data"]):
+            logger.info("%s training data was modified, not appended to", self.name.capitalize())
+            return False
         
-        logger.info("Training completed successfully")
+        start = time.perf_counter()
+        new_checkpoint = data_checkpoint(DATA_PATH)
+        df = self._read_data()
+        appended = len(df) - checkpoint["rows"]
+        if appended <= 0:
+            return False
+        
+        encoders, scaler = artifact["encoders"], artifact["scaler"]
+        try:
+            encoded = {col: encoders[col].transform(df[col]) for col in self.categorical_columns}
+        except ValueError as e:
+            logger.info("Appended rows add new labels, retraining %s models: %s", self.name, e)
+            return False
+        # The stored scaler is kept so the trees that stay valid see the same feature scale
+        X_scaled = scaler.transform(df[['TotalHeight']].values)
+        targets = self._targets(df, encoded)
+        
+        n_estimators = self.params["n_estimators"]
+        replaced = max(
+            int(np.ceil(n_estimators * INCREMENTAL_TREE_FRACTION)),
+            int(np.ceil(n_estimators * appended / len(df)))
+        )
+        workers = TRAINING_WORKERS if workers is None else workers
+        models, accuracies, reference, timings = dict(artifact["models"]), {}, {}, {}
+        for name, (kind, columns, y) in targets.items():
+            # The previous forest on all rows, old and appended, before its trees are replaced
+            reference.update(zip(columns, score_target(kind, models[name], X_scaled, y)))
+            models[name], scores, seconds = replace_trees(
+                kind, models[name], X_scaled, y, replaced, seed=len(df), n_jobs=workers
+            )
+            timings[name] = round(seconds, 3)
+            accuracies.update(zip(columns, scores))
+        
+        full_accuracies = artifact["full_accuracies"]
+        drift = {col: round(accuracies[col] - reference[col], 4) for col in accuracies}
+        worst = min(drift.values())
+        if worst < -MAX_ACCURACY_DRIFT:
+            logger.info(
+                "%s accuracy drifted %s below the previous models, retraining from scratch",
+                self.name.capitalize(), worst
+            )
+            return False
+        
+        self.models, self.encoders, self.scaler = models, encoders, scaler
+        self.accuracies, self.full_accuracies, self.drift = accuracies, full_accuracies, drift
+        self.checkpoint = {"rows": len(df), "data": new_checkpoint}
+        self.timings = dict(timings, total=round(time.perf_counter() - start, 3))
+        logger.info(
+            "%s prediction models refreshed with %s appended rows in %ss "
+            "(%s/%s trees refit, largest accuracy drift %s)",
+            self.name.capitalize(), appended, self.timings["total"], replaced, n_estimators, worst
+        )
+        self._models_changed()
+        return True
+    
+    def _models_changed(self):
+        for listener in self.listeners:
+            listener()
+    
+    def artifact_key(self):
+        """Key of the stored artifact matching the current data and hyperparameters"""
+        return fingerprint(DATA_PATH, self.config())
+    
+    def config(self):
+        return {
+            "params": self.params,
+            "layout": self.layout,
+            "categorical_columns": self.categorical_columns,
+            "numerical_columns": self.numerical_columns
+        }
+    
+    def load_or_train(self, store, incremental=INCREMENTAL_TRAINING):
+        """
+        Restore fitted models from the artifact store, training only on a cache
+        miss; with incremental set, a miss caused by appended rows refreshes
+        the previous artifact instead
+        """
+        key = self.artifact_key()
+        start = time.perf_counter()
+        artifact = store.load(self.name, key)
+        if artifact is not None:
+            self.models = artifact["models"]
+            self.encoders = artifact["encoders"]
+            self.scaler = artifact["scaler"]
+            self.accuracies = artifact["accuracies"]
+            self.full_accuracies = artifact.get("full_accuracies", self.accuracies)
+            self.drift = artifact.get("drift", {})
+            self.checkpoint = artifact.get("checkpoint")
+            logger.info("Loaded %s prediction models from artifact %s", self.name, key)
+            MODEL_LOAD_SECONDS.observe(time.perf_counter() - start, self.name, "artifact")
+            self._models_changed()
+            return
+        
+        previous = store.load_latest(self.name) if incremental else None
+        if previous is not None and self.update(previous):
+            MODEL_LOAD_SECONDS.observe(time.perf_counter() - start, self.name, "incremental")
+        else:
+            start = time.perf_counter()
+            self.train()
+            MODEL_LOAD_SECONDS.observe(time.perf_counter() - start, self.name, "train")
+        store.save(self.name, key, {
+            "models": self.models,
+            "encoders": self.encoders,
+            "scaler": self.scaler,
+            "accuracies": self.accuracies,
+            "full_accuracies": self.full_accuracies,
+            "drift": self.drift,
+            "checkpoint": self.checkpoint,
+            "config": self.config()
+        })
+    
+    def memory_report(self):
+        """Trees, nodes, depth and serialized bytes of every fitted model, plus the total"""
+        report = {name: model_memory(model) for name, model in self.models.items()}
+        report["total"] = {
+            key: sum(entry[key] for entry in report.values()) for key in ["trees", "nodes", "bytes"]
+        }
+        return report
+    
+    def flatten(self):
+        """Replace the fitted forests by array-backed FlatForests with identical predictions"""
+        self.models = {
+            name: model if isinstance(model, FlatForest) else FlatForest.from_forest(model)
+            for name, model in self.models.items()
+        }
+        logger.info("Flattened %s prediction models (%s bytes)", self.name, self.memory_report()["total"]["bytes"])
+        self._models_changed()
+    
+    def compact(self, tolerance=MAX_ACCURACY_DRIFT, **params):
+        """
+        Retrain with compacting forest parameters (n_estimators, max_depth,
+        ccp_alpha, ...) and adopt the result only if no column's accuracy drops
+        more than `tolerance` below the current accuracies. Returns a report of
+        memory and accuracy before and after.
+        """
+        candidate = MeasurementModels(
+            self.categorical_columns, self.numerical_columns, self.layout, self.name
+        )
+        candidate.params = dict(self.params, **params)
+        candidate.train()
+        
+        drops = {col: round(self.accuracies[col] - candidate.accuracies[col], 4) for col in self.accuracies}
+        accepted = max(drops.values()) <= tolerance
+        report = {
+            "params": candidate.params,
+            "accepted": accepted,
+            "accuracy_drops": drops,
+            "accuracies_before": dict(self.accuracies),
+            "accuracies_after": candidate.accuracies,
+            "memory_before": self.memory_report(),
+            "memory_after": candidate.memory_report()
+        }
+        if accepted:
+            self.params = candidate.params
+            self.models, self.encoders, self.scaler = candidate.models, candidate.encoders, candidate.scaler
+            self.accuracies, self.full_accuracies = candidate.accuracies, candidate.full_accuracies
+            self.drift, self.checkpoint = {}, candidate.checkpoint
+            self._models_changed()
+        logger.info(
+            "%s compacted %s models %s: %s -> %s bytes, largest accuracy drop %s",
+            "Adopted" if accepted else "Rejected", self.name, params,
+            report["memory_before"]["total"]["bytes"], report["memory_after"]["total"]["bytes"], max(drops.values())
+        )
+        return report
+    
+    def forests(self, columns):
+        """Fitted forests needed to predict the given columns"""
+        if self.layout == "multi_output":
+            return [
+                self.models[kind] for kind, kind_columns in [
+                    ("categorical", self.categorical_columns),
+                    ("numerical", self.numerical_columns)
+                ] if any(col in kind_columns for col in columns)
+            ]
+        return [self.models[col] for col in columns]
+    
+    def predict_columns(self, features_scaled, columns):
+        """Decoded predictions for a batch of scaled heights, one array per requested column"""
+        categorical = [col for col in columns if col in self.categorical_columns]
+        numerical = [col for col in columns if col in self.numerical_columns]
+        values = {}
+        
+        if self.layout == "multi_output":
+            if categorical:
+                with INFERENCE_SECONDS.time("categorical"):
+                    encoded = self.models["categorical"].predict(features_scaled)
+                for col in categorical:
+                    i = self.categorical_columns.index(col)
+                    values[col] = self.encoders[col].inverse_transform(encoded[:, i].astype(int))
+            if numerical:
+                with INFERENCE_SECONDS.time("numerical"):
+                    predictions = self.models["numerical"].predict(features_scaled)
+                for col in numerical:
+                    values[col] = predictions[:, self.numerical_columns.index(col)]
+            return values
+        
+        # Predict categorical values
+        for col in categorical:
+            with INFERENCE_SECONDS.time(col):
+                encoded = self.models[col].predict(features_scaled)
+            values[col] = self.encoders[col].inverse_transform(encoded)
+        
+        # Predict numerical values
+        for col in numerical:
+            with INFERENCE_SECONDS.time(col):
+                values[col] = self.models[col].predict(features_scaled)
+        
+        return values
+
+
+class MeasurementPredictor:
+    """Height-based measurement predictions for one garment, read from a MeasurementModels set"""
+    name = None
+
+    def __init__(self, model_set=None, layout=MODEL_LAYOUT):
+        self.categorical_columns = ['Size', 'Fit']
+        self.numerical_columns = []
+        self.units = {}
+        self.layout = layout
+        self.lookup_table = None
+        self._model_set = None
+        if model_set is not None:
+            self.use_model_set(model_set)
+    
+    def use_model_set(self, model_set):
+        self._model_set = model_set
+        model_set.listeners.append(self._models_changed)
+    
+    @property
+    def model_set(self):
+        # A predictor created on its own trains a private set covering just its columns
+        if self._model_set is None:
+            self.use_model_set(MeasurementModels(
+                self.categorical_columns, self.numerical_columns, self.layout, name=self.name
+            ))
+        return self._model_set
+    
+    @property
+    def models(self):
+        return self.model_set.models
+    
+    @property
+    def encoders(self):
+        return self.model_set.encoders
+    
+    @property
+    def scaler(self):
+        return self.model_set.scaler
+    
+    @property
+    def accuracies(self):
+        return self.model_set.accuracies
+    
+    @property
+    def columns(self):
+        return self.categorical_columns + self.numerical_columns
+    
+    def train(self):
+        self.model_set.train()
+    
+    def load_or_train(self, store):
+        self.model_set.load_or_train(store)
+    
+    def _models_changed(self):
+        if self.lookup_table is not None:
+            self.compile()
+    
+    def compile(self):
+        """Answer predictions from a lookup table that exactly reproduces the forests"""
+        self.lookup_table = HeightLookupTable.compile(
+            self.scaler, self.model_set.forests(self.columns), self._predict_rows
+        )
+        logger.info(
+            "Compiled %s prediction models into %s height intervals", self.name, len(self.lookup_table.rows)
+        )
+    
+    def _predict_columns(self, features_scaled):
+        """Decoded predictions for a batch of scaled heights, one array per column"""
+        return self.model_set.predict_columns(features_scaled, self.columns)
+    
+    def _predict_rows(self, features_scaled):
+        values = self._predict_columns(features_scaled)
+        rows = []
+        for i in range(len(features_scaled)):
+            row = {}
+            for col in self.categorical_columns:
+                row[col] = str(values[col][i])
+            for col in self.numerical_columns:
+                row[col] = round(float(values[col][i]), 2)
+            rows.append(row)
+        return rows
+    
+    def _predict_values(self, height):
+        if self.lookup_table is not None:
+            with STAGE_SECONDS.time(self.name, "lookup"):
+                return self.lookup_table.lookup(height)
+        
+        with STAGE_SECONDS.time(self.name, "scaling"):
+            features = np.array([[height]])
+            features_scaled = self.scaler.transform(features)
+        with STAGE_SECONDS.time(self.name, "inference"):
+            return self._predict_rows(features_scaled)[0]
     
     def predict(self, height, weight=None, body_type=None):
-        features = np.array([[height]])
-        features_scaled = self.scaler.transform(features)
+        values = self._predict_values(height)
+        with STAGE_SECONDS.time(self.name, "dict_building"):
+            return self._predictions(values, height, weight, body_type)
+    
+    def _predictions(self, values, height, weight, body_type):
+        output_key = f"{self.name}_predictions"
         
         predictions = {
             "input": {
@@ -96,7 +592,7 @@ class ShirtPredictor:
                 "timestamp_utc": CURRENT_TIME,
                 "user": CURRENT_USER
             },
-            "shirt_predictions": {},
+            output_key: {},
             "model_accuracies": {}
         }
         
@@ -106,123 +602,347 @@ class ShirtPredictor:
         if body_type is not None:
             predictions["input"]["body_type"] = body_type
         
-        # Predict categorical values
         for col in self.categorical_columns:
-            pred = self.encoders[col].inverse_transform(
-                self.models[col].predict(features_scaled)
-            )[0]
-            predictions["shirt_predictions"][col] = {
-                "value": str(pred)
+            predictions[output_key][col] = {
+                "value": values[col]
             }
             predictions["model_accuracies"][col] = self.accuracies[col]
         
-        # Predict numerical values
         for col in self.numerical_columns:
-            pred = self.models[col].predict(features_scaled)[0]
-            predictions["shirt_predictions"][col] = {
-                "value": round(float(pred), 2),
+            predictions[output_key][col] = {
+                "value": values[col],
                 "unit": self.units.get(col, "")
             }
             predictions["model_accuracies"][col] = self.accuracies[col]
         
         return predictions
     
+    def predict_batch(self, requests):
+        """
+        predict() for a list of (height, weight, body_type) requests, with one
+        model call per column for the whole list; used by the micro-batcher
+        """
+        BATCH_SIZES.observe(len(requests), self.name)
+        heights = [height for height, _, _ in requests]
+        if self.lookup_table is not None:
+            with STAGE_SECONDS.time(self.name, "lookup"):
+                rows = [self.lookup_table.lookup(height) for height in heights]
+        else:
+            with STAGE_SECONDS.time(self.name, "scaling"):
+                features_scaled = self.scaler.transform(np.array(heights, dtype=float).reshape(-1, 1))
+            with STAGE_SECONDS.time(self.name, "inference"):
+                rows = self._predict_rows(features_scaled)
+        with STAGE_SECONDS.time(self.name, "dict_building"):
+            return [
+                self._predictions(values, height, weight, body_type)
+                for values, (height, weight, body_type) in zip(rows, requests)
+            ]
+    
+    def predict_many(self, heights, output="columns"):
+        """
+        Vectorized predictions for a batch of heights, returned column-wise.
+        output is "columns" (dict of NumPy arrays), "dataframe" or "arrow".
+        """
+        heights = np.asarray(heights, dtype=float).reshape(-1)
+        if len(heights) == 0:
+            values = {col: [] for col in self.columns}
+        elif self.lookup_table is not None:
+            values = self.lookup_table.lookup_many(heights)
+        else:
+            values = self._predict_columns(self.scaler.transform(heights.reshape(-1, 1)))
+        
+        columns = {"height": heights}
+        for col in self.categorical_columns:
+            columns[col] = np.asarray(values[col]).astype(str)
+        for col in self.numerical_columns:
+            # Python's round() as in predict(); np.round differs from it on near-ties
+            columns[col] = np.array([round(float(value), 2) for value in values[col]], dtype=float)
+        
+        if output == "dataframe":
+            import pandas as pd
+            return pd.DataFrame(columns)
+        if output == "arrow":
+            import pyarrow as pa
+            return pa.table(columns)
+        return columns
+
+
+class ShirtPredictor(MeasurementPredictor):
+    name = 'shirt'
+
+    def __init__(self, model_set=None, layout=MODEL_LAYOUT):
+        super().__init__(model_set, layout)
+        self.numerical_columns = [
+            'ChestWidth', 'ShoulderWidth', 'ArmLength',
+            'ShoulderToWaist', 'Belly', 'Waist'
+        ]
+        self.units = {
+            'ChestWidth': 'cm',
+            'ShoulderWidth': 'cm',
+            'ArmLength': 'cm',
+            'ShoulderToWaist': 'cm',
+            'Belly': 'cm',
+            'Waist': 'cm',
+            'Weight': 'kg',
+            'TotalHeight': 'cm'
+        }
+    
+
+
+class SizeChartPredictor:
+    """
+    Brand size charts for one garment, served from a SizeChartIndex that
+    reload() replaces whole, so requests see either the old or the new charts
+    """
+    name = None
+    dimensions = []
+    tolerance = 0
+
+    def __init__(self, size_charts_path):
+        self.size_charts_path = size_charts_path
+        self.listeners = []
+        self.reload()
+    
+    @property
+    def brand_charts(self):
+        return self.index.charts()
+    
+    def reload(self):
+        """
+        Load the size charts and swap in the new index, then notify listeners.
+        A failed reload keeps the charts loaded before; a failed first load raises.
+        """
+        start = time.perf_counter()
+        try:
+            index = load_size_index(self.size_charts_path, self.dimensions, self.tolerance)
+        except Exception as e:
+            logger.error("Failed to load %s size charts: %s", self.name, e)
+            if not hasattr(self, "index"):
+                raise
+            # Keep serving the charts loaded before, e.g. while the file is being rewritten
+            return
+        logger.info("Successfully loaded %s brands from %s size charts", len(index.brands), self.name)
+        # One line for the whole catalog, however many brands it has
+        logger.debug("Loaded %s size charts for %s", self.name, index.brands)
+        self.index = index
+        MODEL_LOAD_SECONDS.observe(time.perf_counter() - start, f"{self.name}_size_charts", "size_charts")
+        for listener in self.listeners:
+            listener()
+    
+    def _brand_recommendations(self, measurements, describe):
+        """
+        Sizes whose ranges (with tolerance) contain the measurements, grouped
+        by brand in chart order; describe(brand, size) gives each size's entry
+        """
+        # Requests read self.index once per call, so a concurrent reload cannot mix charts
+        index = self.index
+        point = [measurements[dim] for dim in self.dimensions]
+        recommendations, brand_results = [], {}
+        for position in index.query(point):
+            brand_position, size = index.sizes[position]
+            if brand_position not in brand_results:
+                brand_results[brand_position] = {
+                    "brand": index.brands[brand_position],
+                    "matching_sizes": []
+                }
+                recommendations.append(brand_results[brand_position])
+            brand_results[brand_position]["matching_sizes"].append(describe(index.brands[brand_position], size))
+        return recommendations
+    
+    def find_closest_sizes(self, measurements, k=3, weights=None):
+        """The k sizes across all brands closest to the measurements"""
+        return closest_size_matches(self.index, self.dimensions, measurements, k, weights)
+    
+    def find_matching_sizes_many(self, measurements):
+        """Matching sizes for many customers at once, measurements mapping each dimension to an array"""
+        return size_matches_frame(self.index, self.dimensions, measurements)
+
 
+class BrandSizePredictor(SizeChartPredictor):
+    name = 'shirt'
+    dimensions = SHIRT_SIZE_DIMENSIONS
 
-class BrandSizePredictor:
-    def __init__(self):
-        with open(SHIRT_SIZE_CHARTS_PATH, 'r') as f:
-            self.brand_charts = json.load(f)
+    def __init__(self, size_charts_path=SHIRT_SIZE_CHARTS_PATH):
+        super().__init__(size_charts_path)
     
     def find_matching_sizes(self, measurements):
-        results = {
+        def describe(brand, size):
+            return {
+                "size": size["label"],
+                "fit_details": {
+                    "chest_range": size["chest"],
+                    "waist_range": size["waist"],
+                    "shoulder_range": size["shoulder"]
+                }
+            }
+        
+        return {
             "input_measurements": {
                 "chest": measurements["chest"],
                 "waist": measurements["waist"],
                 "shoulder": measurements["shoulder"],
                 "unit": "cm"
             },
-            "brand_recommendations": [],
+            # Only the sizes whose ranges contain the measurements, in chart order
+            "brand_recommendations": self._brand_recommendations(measurements, describe),
             "timestamp_utc": CURRENT_TIME,
             "user": CURRENT_USER
         }
-        
-        for brand in self.brand_charts:
-            brand_result = {
-                "brand": brand["brand"],
-                "matching_sizes": []
+
+
+def closest_size_matches(index, dimensions, measurements, k=3, weights=None):
+    """
+    Rank sizes by weighted distance from the measurements to their ranges.
+    weights maps a dimension name to its weight; missing dimensions weigh 1.
+    """
+    point = [measurements[dim] for dim in dimensions]
+    if weights is not None:
+        weights = [weights.get(dim, 1.0) for dim in dimensions]
+    positions, distances = index.nearest(point, k, weights)
+    offsets = index.offsets(point, positions)
+    
+    closest_matches = []
+    for position, distance, offset in zip(positions, distances, offsets):
+        brand_position, size = index.sizes[position]
+        closest_matches.append({
+            "brand": index.brands[brand_position],
+            "size": size["label"],
+            "distance": round(float(distance), 2),
+            # Positive when the measurement is above the size's range, negative when below
+            "adjustments_needed": {
+                dim: f"{value:+.1f} cm" for dim, value in zip(dimensions, offset)
             }
-            
-            for size in brand["sizes"]:
-                if (size["chest"][0] <= measurements["chest"] <= size["chest"][1] and
-                    size["waist"][0] <= measurements["waist"] <= size["waist"][1] and
-                    size["shoulder"][0] <= measurements["shoulder"] <= size["shoulder"][1]):
-                    
-                    brand_result["matching_sizes"].append({
-                        "size": size["label"],
-                        "fit_details": {
-                            "chest_range": size["chest"],
-                            "waist_range": size["waist"],
-                            "shoulder_range": size["shoulder"]
-                        }
-                    })
-            
-            if brand_result["matching_sizes"]:
-                results["brand_recommendations"].append(brand_result)
-        
+        })
+    return closest_matches
+
+
+def size_matches_frame(index, dimensions, measurements):
+    """
+    Vectorized size matching for a batch of customers. Returns one row per
+    (customer, matching size) with the customer's row number, brand, size
+    label and a fit code per dimension (see size_index.FIT_*).
+    """
+    import pandas as pd
+    
+    points = np.column_stack([np.asarray(measurements[dim], dtype=float) for dim in dimensions])
+    rows, positions, codes = index.match_pairs(points)
+    columns = {
+        "customer": rows,
+        "brand": np.array(index.brands, dtype=object)[index.brand_ids[positions]],
+        "size": index.labels[positions]
+    }
+    for d, dim in enumerate(dimensions):
+        columns[f"{dim}_fit"] = codes[:, d]
+    return pd.DataFrame(columns)
+
+
+class InvalidInput(ValueError):
+    """A request input that is missing or not a usable measurement"""
+
+
+def number(value, name, optional=False):
+    """A positive, finite measurement input as a float; None only when optional"""
+    if value is None:
+        if optional:
+            return None
+        raise InvalidInput(f"{name} is required")
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise InvalidInput(f"{name} must be a number, got {value!r}")
+    if not math.isfinite(value) or value <= 0:
+        raise InvalidInput(f"{name} must be a positive number, got {value}")
+    return value
+
+def error_payload(e, endpoint):
+    ERRORS.inc(endpoint, type(e).__name__)
+    invalid = isinstance(e, InvalidInput)
+    if invalid:
+        logger.info("%s rejected invalid input: %s", endpoint, e, extra={"endpoint": endpoint})
+    else:
+        logger.error("%s failed: %s", endpoint, e, extra={"endpoint": endpoint})
+    return {
+        "error": str(e),
+        # HTTP status for the JSON API: 400 for invalid input, 500 for failures
+        "status": 400 if invalid else 500,
+        "timestamp_utc": CURRENT_TIME,
+        "user": CURRENT_USER
+    }
+
+def measure(predictor, height, weight, body_type):
+    """One prediction, through the predictor's micro-batcher when batching is on and it runs forests"""
+    # A compiled table lookup costs microseconds, less than queueing it would
+    if MICRO_BATCHING and predictor.lookup_table is None:
+        return batchers[predictor.name].submit((height, weight, body_type))
+    return predictor.predict(height, weight, body_type)
+
+def matching_sizes(garment, predictor, measurements, closest=False):
+    """
+    Cached brand size matches for the measurements, keyed on their quantize()
+    values; with closest, the nearest sizes are ranked in when none match
+    """
+    def compute():
+        results = predictor.find_matching_sizes(measurements)
+        if closest and not results["brand_recommendations"]:
+            results["closest_sizes"] = predictor.find_closest_sizes(measurements)
         return results
     
+    return size_cache.get_or_compute(
+        (garment, closest) + tuple(quantize(value, MEASUREMENT_STEP) for value in measurements.values()),
+        compute
+    )
 
+def shirt_measurements(height, weight=None, body_type=None):
+    """Shirt predictions as a dict, with any failure reported in the payload"""
+    REQUESTS.inc("shirt_measurements")
+    with REQUEST_SECONDS.time("shirt_measurements"):
+        try:
+            initialize()
+            height, weight = number(height, "height"), number(weight, "weight", optional=True)
+            height, weight = quantize(height, HEIGHT_STEP), quantize(weight, WEIGHT_STEP, optional=True)
+            return measurement_cache.get_or_compute(
+                ("shirt", height, weight, body_type),
+                lambda: measure(shirt_predictor, height, weight, body_type)
+            )
+        except Exception as e:
+            return error_payload(e, "shirt_measurements")
 
-# Initialize predictors
-shirt_predictor = ShirtPredictor()
-shirt_predictor.train()
-brand_predictor = BrandSizePredictor()
+def brand_sizes(chest, waist, shoulder):
+    """Brand size recommendations as a dict, with any failure reported in the payload"""
+    REQUESTS.inc("brand_sizes")
+    with REQUEST_SECONDS.time("brand_sizes"):
+        try:
+            initialize()
+            inputs = {"chest": number(chest, "chest"), "waist": number(waist, "waist"), "shoulder": number(shoulder, "shoulder")}
+            return matching_sizes("shirt", brand_predictor, inputs)
+        except Exception as e:
+            return error_payload(e, "brand_sizes")
 
 def predict_shirt_measurements(height, weight=None, body_type=None):
     """Gradio interface function for shirt predictions"""
-    try:
-        predictions = shirt_predictor.predict(height, weight, body_type)
+    predictions = shirt_measurements(height, weight, body_type)
+    with STAGE_SECONDS.time("shirt", "serialization"):
         return json.dumps(predictions, indent=2)
-    except Exception as e:
-        return json.dumps({
-            "error": str(e),
-            "timestamp_utc": CURRENT_TIME,
-            "user": CURRENT_USER
-        }, indent=2)
 
 def predict_brand_sizes(chest, waist, shoulder):
     """Gradio interface function for brand size predictions"""
-    try:
-        measurements = {
-            "chest": float(chest),
-            "waist": float(waist),
-            "shoulder": float(shoulder)
-        }
-        predictions = brand_predictor.find_matching_sizes(measurements)
+    predictions = brand_sizes(chest, waist, shoulder)
+    with STAGE_SECONDS.time("shirt_sizes", "serialization"):
         return json.dumps(predictions, indent=2)
-    except Exception as e:
-        return json.dumps({
-            "error": str(e),
-            "timestamp_utc": CURRENT_TIME,
-            "user": CURRENT_USER
-        }, indent=2)
     
 
 
 
 # pants
-class PantsPredictor:
-    def __init__(self):
-        self.models = {}
-        self.encoders = {}
-        self.scaler = StandardScaler()
-        self.categorical_columns = ['Size', 'Fit']
+class PantsPredictor(MeasurementPredictor):
+    name = 'pants'
+
+    def __init__(self, model_set=None, layout=MODEL_LAYOUT):
+        super().__init__(model_set, layout)
         self.numerical_columns = [
             'Waist', 'Hips', 'LegLength',
             'WaistToKnee', 'Belly'
         ]
-        self.accuracies = {}
         self.units = {
             'Waist': 'cm',
             'Hips': 'cm',
@@ -232,92 +952,44 @@ class PantsPredictor:
             'Weight': 'kg',
             'TotalHeight': 'cm'
         }
-    
-    def train(self):
-        logger.info("Loading and preparing pants prediction models...")
-        df = pd.read_csv(CSV_PATH)
-        
-        # Prepare input features
-        base_features = ['TotalHeight']
-        X = df[base_features].values
-        self.scaler.fit(X)
-        X_scaled = self.scaler.transform(X)
-        
-        # Train models for categorical columns
-        for col in self.categorical_columns:
-            self.encoders[col] = LabelEncoder()
-            encoded_values = self.encoders[col].fit_transform(df[col])
-            self.models[col] = RandomForestClassifier(n_estimators=100, random_state=42)
-            self.models[col].fit(X_scaled, encoded_values)
-            predictions = self.models[col].predict(X_scaled)
-            self.accuracies[col] = round(accuracy_score(encoded_values, predictions), 4)
-        
-        # Train models for numerical columns
-        for col in self.numerical_columns:
-            self.models[col] = RandomForestRegressor(n_estimators=100, random_state=42)
-            self.models[col].fit(X_scaled, df[col])
-            predictions = self.models[col].predict(X_scaled)
-            self.accuracies[col] = round(r2_score(df[col], predictions), 4)
-        
-        logger.info("Pants prediction models trained successfully")
-    
-    def predict(self, height, weight=None, body_type=None):
-        features = np.array([[height]])
-        features_scaled = self.scaler.transform(features)
-        
-        predictions = {
-            "input": {
-                "height": float(height),
-                "unit": "cm",
-                "timestamp_utc": CURRENT_TIME,
-                "user": CURRENT_USER
-            },
-            "pants_predictions": {},
-            "model_accuracies": {}
-        }
-        
-        if weight is not None:
-            predictions["input"]["weight"] = float(weight)
-            predictions["input"]["weight_unit"] = "kg"
-        if body_type is not None:
-            predictions["input"]["body_type"] = body_type
-        
-        # Predict categorical values
-        for col in self.categorical_columns:
-            pred = self.encoders[col].inverse_transform(
-                self.models[col].predict(features_scaled)
-            )[0]
-            predictions["pants_predictions"][col] = {
-                "value": str(pred)
-            }
-            predictions["model_accuracies"][col] = self.accuracies[col]
-        
-        # Predict numerical values
-        for col in self.numerical_columns:
-            pred = self.models[col].predict(features_scaled)[0]
-            predictions["pants_predictions"][col] = {
-                "value": round(float(pred), 2),
-                "unit": self.units.get(col, "")
-            }
-            predictions["model_accuracies"][col] = self.accuracies[col]
-        
-        return predictions
 
-class PantsSizePredictor:
+class PantsSizePredictor(SizeChartPredictor):
+    name = 'pants'
+    dimensions = PANTS_SIZE_DIMENSIONS
+    tolerance = PANTS_SIZE_TOLERANCE
+
     def __init__(self, size_charts_path=PANTS_SIZE_CHARTS_PATH):
-        try:
-            with open(size_charts_path, 'r') as f:
-                self.brand_charts = json.load(f)
-                logger.info(f"Successfully loaded {len(self.brand_charts)} brands from size charts")
-                # Add debug logging for loaded size charts
-                for brand in self.brand_charts:
-                    logger.info(f"Loaded size chart for {brand['brand']}")
-        except Exception as e:
-            logger.error(f"Failed to load pants size charts: {str(e)}")
-            self.brand_charts = []
+        super().__init__(size_charts_path)
     
     def find_matching_sizes(self, measurements):
-        logger.info(f"Finding sizes for measurements: {measurements}")
+        logger.debug("Finding sizes for measurements: %s", measurements)
+        # Per-size traces only for a sample of calls, decided once per call
+        trace = logger.isEnabledFor(logging.DEBUG) and random.random() < SIZE_TRACE_SAMPLE_RATE
+        
+        def describe(brand_name, size):
+            if trace:
+                logger.debug(
+                    "Matched %s size %s: waist %s in %s-%s, hips %s in %s-%s, leg %s in %s-%s",
+                    brand_name, size['label'],
+                    measurements['waist'], size['waist'][0] - PANTS_SIZE_TOLERANCE, size['waist'][1] + PANTS_SIZE_TOLERANCE,
+                    measurements['hips'], size['hips'][0] - PANTS_SIZE_TOLERANCE, size['hips'][1] + PANTS_SIZE_TOLERANCE,
+                    measurements['leg_length'], size['leg_length'][0] - PANTS_SIZE_TOLERANCE, size['leg_length'][1] + PANTS_SIZE_TOLERANCE,
+                    extra={"brand": brand_name, "size": size['label']}
+                )
+            return {
+                "size": size["label"],
+                "fit_details": {
+                    "waist_range": f"{size['waist'][0]}-{size['waist'][1]} cm",
+                    "hips_range": f"{size['hips'][0]}-{size['hips'][1]} cm",
+                    "leg_length_range": f"{size['leg_length'][0]}-{size['leg_length'][1]} cm"
+                },
+                "fit_quality": {
+                    "waist": "Perfect" if size["waist"][0] <= measurements["waist"] <= size["waist"][1] else "Slightly loose/tight",
+                    "hips": "Perfect" if size["hips"][0] <= measurements["hips"] <= size["hips"][1] else "Slightly loose/tight",
+                    "leg_length": "Perfect" if size["leg_length"][0] <= measurements["leg_length"] <= size["leg_length"][1] else "Slightly long/short"
+                }
+            }
+        
         results = {
             "input_measurements": {
                 "waist": measurements["waist"],
@@ -327,59 +999,12 @@ class PantsSizePredictor:
                 "timestamp_utc": CURRENT_TIME,
                 "user": CURRENT_USER
             },
-            "brand_recommendations": []
+            "brand_recommendations": self._brand_recommendations(measurements, describe)
         }
         
-        for brand in self.brand_charts:
-            brand_result = {
-                "brand": brand["brand"],
-                "matching_sizes": []
-            }
-            
-            for size in brand["sizes"]:
-                # Add tolerance of ±2cm for better matching
-                waist_min = size["waist"][0] - 2
-                waist_max = size["waist"][1] + 2
-                hips_min = size["hips"][0] - 2
-                hips_max = size["hips"][1] + 2
-                leg_min = size["leg_length"][0] - 2
-                leg_max = size["leg_length"][1] + 2
-                
-                # Debug logging for size checks
-                logger.debug(f"""
-                Checking {brand['brand']} size {size['label']}:
-                Waist: {measurements['waist']} in range {waist_min}-{waist_max}
-                Hips: {measurements['hips']} in range {hips_min}-{hips_max}
-                Leg: {measurements['leg_length']} in range {leg_min}-{leg_max}
-                """)
-                
-                # Check if measurements fall within the size ranges (with tolerance)
-                if (waist_min <= measurements["waist"] <= waist_max and
-                    hips_min <= measurements["hips"] <= hips_max and
-                    leg_min <= measurements["leg_length"] <= leg_max):
-                    
-                    size_match = {
-                        "size": size["label"],
-                        "fit_details": {
-                            "waist_range": f"{size['waist'][0]}-{size['waist'][1]} cm",
-                            "hips_range": f"{size['hips'][0]}-{size['hips'][1]} cm",
-                            "leg_length_range": f"{size['leg_length'][0]}-{size['leg_length'][1]} cm"
-                        },
-                        "fit_quality": {
-                            "waist": "Perfect" if size["waist"][0] <= measurements["waist"] <= size["waist"][1] else "Slightly loose/tight",
-                            "hips": "Perfect" if size["hips"][0] <= measurements["hips"] <= size["hips"][1] else "Slightly loose/tight",
-                            "leg_length": "Perfect" if size["leg_length"][0] <= measurements["leg_length"] <= size["leg_length"][1] else "Slightly long/short"
-                        }
-                    }
-                    brand_result["matching_sizes"].append(size_match)
-                    logger.info(f"Found matching size {size['label']} for {brand['brand']}")
-            
-            if brand_result["matching_sizes"]:
-                results["brand_recommendations"].append(brand_result)
-        
         # Add debugging information
         if not results["brand_recommendations"]:
-            logger.warning(f"No matching sizes found for measurements: {measurements}")
+            logger.warning("No matching sizes found for measurements: %s", measurements)
             results["debug_info"] = {
                 "message": "No exact matches found. Consider these suggestions:",
                 "suggestions": [
@@ -394,68 +1019,269 @@ class PantsSizePredictor:
         return results
     
     def _find_closest_matches(self, measurements):
-        closest_matches = []
-        for brand in self.brand_charts:
-            for size in brand["sizes"]:
-                # Calculate how close this size is to the measurements
-                waist_diff = min(abs(measurements["waist"] - size["waist"][0]), 
-                               abs(measurements["waist"] - size["waist"][1]))
-                hips_diff = min(abs(measurements["hips"] - size["hips"][0]),
-                              abs(measurements["hips"] - size["hips"][1]))
-                leg_diff = min(abs(measurements["leg_length"] - size["leg_length"][0]),
-                             abs(measurements["leg_length"] - size["leg_length"][1]))
-                
-                if waist_diff <= 5 and hips_diff <= 5 and leg_diff <= 5:
-                    closest_matches.append({
-                        "brand": brand["brand"],
-                        "size": size["label"],
-                        "adjustments_needed": {
-                            "waist": f"{waist_diff:+.1f} cm",
-                            "hips": f"{hips_diff:+.1f} cm",
-                            "leg_length": f"{leg_diff:+.1f} cm"
-                        }
-                    })
-        
-        return closest_matches[:3]  # Return top 3 closest matches
+        return self.find_closest_sizes(measurements, k=3)  # Return top 3 closest matches
+
+
+
+# Full outfit
+class OutfitPredictor(MeasurementPredictor):
+    """
+    Measurements for several garments in one pass over their shared model
+    set: the height is scaled once and every column, including those the
+    garments have in common, is predicted once
+    """
+    name = 'outfit'
+
+    def __init__(self, garment_predictors, layout=MODEL_LAYOUT):
+        super().__init__(garment_predictors[0].model_set, layout)
+        self.garment_predictors = list(garment_predictors)
+        self.categorical_columns, self.numerical_columns = [], []
+        for predictor in self.garment_predictors:
+            self.categorical_columns += [c for c in predictor.categorical_columns if c not in self.categorical_columns]
+            self.numerical_columns += [c for c in predictor.numerical_columns if c not in self.numerical_columns]
+    
+    def _predictions(self, values, height, weight, body_type):
+        # Each garment's part is exactly what its own predict() returns
+        return {
+            predictor.name: predictor._predictions(values, height, weight, body_type)
+            for predictor in self.garment_predictors
+        }
+    
+
+
 
+# Initialize predictors
+# Models and size charts are loaded on first use, or ahead of traffic by warm_up(),
+# so that importing this module does not train or read anything
+_init_lock = threading.Lock()
+_ready = threading.Event()
+_init_error = None
+
+def initialize():
+    """
+    Load the models and size charts once; later calls return immediately.
+    A failure is remembered and raised again without retrying, so requests
+    fail fast instead of each rerunning the whole load; restart to retry.
+    """
+    global model_store, measurement_cache, size_cache, measurement_models, chart_watcher, batchers
+    global shirt_predictor, pants_predictor, outfit_predictor, brand_predictor, pants_size_predictor, _init_error
+    if _ready.is_set():
+        return
+    with _init_lock:
+        if _ready.is_set():
+            return
+        if _init_error is not None:
+            raise RuntimeError(f"Predictors failed to initialize: {_init_error}")
+        start = time.perf_counter()
+        try:
+            # Results are cached per input (see quantize) and dropped whenever the models or size charts change
+            measurement_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+            size_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+            
+            # Measurement predictors share one model set
+            model_store = ModelStore(MODEL_STORE_DIR)
+            shirt_predictor = ShirtPredictor()
+            pants_predictor = PantsPredictor()
+            measurement_models = MeasurementModels.shared([shirt_predictor, pants_predictor])
+            outfit_predictor = OutfitPredictor([shirt_predictor, pants_predictor])
+            measurement_models.load_or_train(model_store)
+            if MODEL_FORMAT == "flat":
+                measurement_models.flatten()
+            if PREDICTOR_MODE == "compiled":
+                shirt_predictor.compile()
+                pants_predictor.compile()
+                outfit_predictor.compile()
+            measurement_models.listeners.append(measurement_cache.clear)
+            
+            # Concurrent calls are batched per predictor; the batcher threads start on first use
+            batchers = {
+                predictor.name: MicroBatcher(
+                    predictor.predict_batch, BATCH_WINDOW, BATCH_MAX_SIZE, name=f"{predictor.name}-batcher"
+                ) for predictor in [shirt_predictor, pants_predictor, outfit_predictor]
+            }
+            
+            brand_predictor = BrandSizePredictor()
+            brand_predictor.listeners.append(size_cache.clear)
+            pants_size_predictor = PantsSizePredictor()
+            pants_size_predictor.listeners.append(size_cache.clear)
+            
+            # Chart updates are recompiled and swapped in from the watcher thread
+            chart_watcher = FileWatcher(CHART_WATCH_INTERVAL)
+            chart_watcher.watch(brand_predictor.size_charts_path, brand_predictor.reload)
+            chart_watcher.watch(pants_size_predictor.size_charts_path, pants_size_predictor.reload)
+            if CHART_WATCH_INTERVAL > 0:
+                chart_watcher.start()
+        except Exception as e:
+            _init_error = str(e)
+            raise
+        _init_error = None
+        _ready.set()
+        logger.info("Predictors ready in %.2fs", time.perf_counter() - start)
+
+def warm_up():
+    """Initialize the predictors in a background thread"""
+    def run():
+        try:
+            initialize()
+        except Exception as e:
+            logger.error("Predictor warm-up failed: %s", e)
+    
+    thread = threading.Thread(target=run, name="predictor-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def prepare_workers():
+    """
+    Load everything in the pre-fork parent so workers inherit it, and stop
+    the parent's chart watcher: threads do not survive a fork
+    """
+    # The web stack is imported here as well so workers share its modules too
+    import fastapi
+    import gradio
+    
+    initialize()
+    chart_watcher.stop()
+
+def start_worker():
+    """Per-worker setup after the fork: each worker watches and reloads its own size charts"""
+    if CHART_WATCH_INTERVAL > 0:
+        chart_watcher.start()
+
+def readiness():
+    """Readiness state for load balancer health checks"""
+    if _ready.is_set():
+        return {"ready": True}
+    if _init_error is not None:
+        return {"ready": False, "error": _init_error}
+    return {"ready": False, "status": "loading" if _init_lock.locked() else "not started"}
 
+_LAZY_ATTRIBUTES = {
+    "model_store", "measurement_cache", "size_cache", "measurement_models",
+    "shirt_predictor", "pants_predictor", "outfit_predictor", "brand_predictor", "pants_size_predictor", "chart_watcher", "batchers"
+}
 
-# Initialize pants predictors
-pants_predictor = PantsPredictor()
-pants_predictor.train()
-pants_size_predictor = PantsSizePredictor()
+def __getattr__(name):
+    # Module-level access such as app.shirt_predictor initializes on demand
+    if name in _LAZY_ATTRIBUTES:
+        initialize()
+        return globals()[name]
+    if name == "demo":
+        globals()["demo"] = create_demo()
+        return globals()["demo"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def pants_measurements(height, weight=None, body_type=None):
+    """Pants predictions as a dict, with any failure reported in the payload"""
+    REQUESTS.inc("pants_measurements")
+    with REQUEST_SECONDS.time("pants_measurements"):
+        try:
+            initialize()
+            height, weight = number(height, "height"), number(weight, "weight", optional=True)
+            height, weight = quantize(height, HEIGHT_STEP), quantize(weight, WEIGHT_STEP, optional=True)
+            return measurement_cache.get_or_compute(
+                ("pants", height, weight, body_type),
+                lambda: measure(pants_predictor, height, weight, body_type)
+            )
+        except Exception as e:
+            return error_payload(e, "pants_measurements")
+
+def pants_sizes(waist, leg_length, hips):
+    """Pants size recommendations as a dict, with any failure reported in the payload"""
+    REQUESTS.inc("pants_sizes")
+    with REQUEST_SECONDS.time("pants_sizes"):
+        try:
+            initialize()
+            inputs = {"waist": number(waist, "waist"), "leg_length": number(leg_length, "leg_length"), "hips": number(hips, "hips")}
+            return matching_sizes("pants", pants_size_predictor, inputs)
+        except Exception as e:
+            return error_payload(e, "pants_sizes")
+
+def outfit(height, weight=None, body_type=None):
+    """
+    Shirt and pants measurements plus brand sizes for both from one height,
+    the predicted measurements feeding the size finders, as one dict
+    """
+    REQUESTS.inc("outfit")
+    with REQUEST_SECONDS.time("outfit"):
+        try:
+            initialize()
+            height, weight = number(height, "height"), number(weight, "weight", optional=True)
+            height, weight = quantize(height, HEIGHT_STEP), quantize(weight, WEIGHT_STEP, optional=True)
+            measurements = measurement_cache.get_or_compute(
+                ("outfit", height, weight, body_type),
+                lambda: measure(outfit_predictor, height, weight, body_type)
+            )
+            shirt = measurements["shirt"]["shirt_predictions"]
+            pants = measurements["pants"]["pants_predictions"]
+            return dict(
+                measurements,
+                # Predicted body measurements rarely fall inside a chart's garment ranges,
+                # so an outfit without any match gets the closest sizes instead
+                shirt_sizes=matching_sizes("shirt", brand_predictor, {
+                    dim: shirt[col]["value"] for dim, col in SHIRT_SIZE_COLUMNS.items()
+                }, closest=True),
+                pants_sizes=matching_sizes("pants", pants_size_predictor, {
+                    dim: pants[col]["value"] for dim, col in PANTS_SIZE_COLUMNS.items()
+                }, closest=True)
+            )
+        except Exception as e:
+            return error_payload(e, "outfit")
+
+def cache_stats():
+    initialize()
+    return {
+        "measurements": measurement_cache.stats(),
+        "sizes": size_cache.stats()
+    }
 
 def predict_pants_measurements(height, weight=None, body_type=None):
     """Gradio interface function for pants predictions based on height"""
-    try:
-        predictions = pants_predictor.predict(height, weight, body_type)
+    predictions = pants_measurements(height, weight, body_type)
+    with STAGE_SECONDS.time("pants", "serialization"):
         return json.dumps(predictions, indent=2)
-    except Exception as e:
-        return json.dumps({
-            "error": str(e),
-            "timestamp_utc": CURRENT_TIME,
-            "user": CURRENT_USER
-        }, indent=2)
 
 def predict_pants_sizes(waist, leg_length, hips):
     """Gradio interface function for pants size predictions"""
-    try:
-        measurements = {
-            "waist": float(waist),
-            "leg_length": float(leg_length),
-            "hips": float(hips)
-        }
-        predictions = pants_size_predictor.find_matching_sizes(measurements)
+    predictions = pants_sizes(waist, leg_length, hips)
+    with STAGE_SECONDS.time("pants_sizes", "serialization"):
+        return json.dumps(predictions, indent=2)
+
+
+def predict_outfit(height, weight=None, body_type=None):
+    """Gradio interface function for full outfit predictions"""
+    predictions = outfit(height, weight, body_type)
+    with STAGE_SECONDS.time("outfit", "serialization"):
         return json.dumps(predictions, indent=2)
+
+def parse_heights(heights):
+    """
+    Accept a list of heights or a comma/whitespace separated string; each
+    must be a valid height, as for the single predictions
+    """
+    if isinstance(heights, str):
+        heights = [value for value in re.split(r"[,\s]+", heights.strip()) if value]
+    return np.array([number(value, f"height {i + 1}") for i, value in enumerate(heights)])
+
+def predict_measurements_batch(heights, garment="shirt"):
+    """Gradio interface function for batch predictions over many heights"""
+    import gradio as gr
+    
+    REQUESTS.inc("measurements_batch")
+    try:
+        with REQUEST_SECONDS.time("measurements_batch"):
+            initialize()
+            predictor = pants_predictor if garment == "pants" else shirt_predictor
+            return predictor.predict_many(parse_heights(heights), output="dataframe")
     except Exception as e:
-        return json.dumps({
-            "error": str(e),
-            "timestamp_utc": CURRENT_TIME,
-            "user": CURRENT_USER
-        }, indent=2)
+        raise gr.Error(error_payload(e, "measurements_batch")["error"])
+
 
+def format_error(predictions):
+    return f"### Prediction failed\n{predictions['error']}\n"
 
 def format_shirt_predictions(predictions):
+    if "error" in predictions:
+        return format_error(predictions)
     formatted = "### Shirt Measurements Predictions\n"
     formatted += f"**Height:** {predictions['input']['height']} cm\n"
     if 'weight' in predictions['input']:
@@ -468,6 +1294,8 @@ def format_shirt_predictions(predictions):
     return formatted
 
 def format_brand_predictions(predictions):
+    if "error" in predictions:
+        return format_error(predictions)
     formatted = "### Brand Size Recommendations\n"
     formatted += f"**Chest:** {predictions['input_measurements']['chest']} cm\n"
     formatted += f"**Waist:** {predictions['input_measurements']['waist']} cm\n"
@@ -483,6 +1311,8 @@ def format_brand_predictions(predictions):
     return formatted
 
 def format_pants_predictions(predictions):
+    if "error" in predictions:
+        return format_error(predictions)
     formatted = "### Pants Measurements Predictions\n"
     formatted += f"**Height:** {predictions['input']['height']} cm\n"
     if 'weight' in predictions['input']:
@@ -495,6 +1325,8 @@ def format_pants_predictions(predictions):
     return formatted
 
 def format_pants_brand_predictions(predictions):
+    if "error" in predictions:
+        return format_error(predictions)
     formatted = "### Pants Size Recommendations\n"
     formatted += f"**Waist:** {predictions['input_measurements']['waist']} cm\n"
     formatted += f"**Hips:** {predictions['input_measurements']['hips']} cm\n"
@@ -509,237 +1341,429 @@ def format_pants_brand_predictions(predictions):
             formatted += f"    - **Leg Length Range:** {size['fit_details']['leg_length_range']}\n"
     return formatted
 
+def format_outfit_predictions(predictions):
+    if "error" in predictions:
+        return format_error(predictions)
+    return "\n".join([
+        format_shirt_predictions(predictions["shirt"]),
+        format_brand_predictions(predictions["shirt_sizes"]),
+        format_pants_predictions(predictions["pants"]),
+        format_pants_brand_predictions(predictions["pants_sizes"])
+    ])
+
+_asset_manifest = None
+
+def garment_model(name):
+    """
+    3D model file for the viewer: the built, content-hashed level of detail
+    when asset_pipeline.py has been run, otherwise the source .glb
+    """
+    global _asset_manifest
+    if _asset_manifest is None:
+        _asset_manifest = static_assets.AssetManifest.load(ASSET_BUILD_DIR) or False
+    if _asset_manifest and name in _asset_manifest.assets:
+        return _asset_manifest.path(name, ASSET_LOD)
+    return f"{name}.glb"
+
 # Update Gradio interface to use formatted predictions
-with gr.Blocks(title="Body Measurements Predictor") as demo:
-    gr.Markdown(f"""
-    # Body Measurements Predictor
-    Created by: {CURRENT_USER}
-    Last Updated: {CURRENT_TIME}
-    """)
-    
-    with gr.Tabs():
-        # First Tab - Shirt Measurements
-        with gr.Tab("Shirt Measurements"):
-            with gr.Row():
-                with gr.Column():
-                    height_input = gr.Number(
-                        label="Height (cm) *",
-                        minimum=50,
-                        maximum=250,
-                        step=1,
-                        value=170
-                    )
-                    weight_input = gr.Number(
-                        label="Weight (kg) (optional)",
-                        minimum=30,
-                        maximum=200,
-                        step=0.1
-                    )
-                    body_type_input = gr.Dropdown(
-                        label="Body Type (optional)",
-                        choices=["Slim", "Regular", "Athletic", "Large"],
-                        value=None
-                    )
-                    predict_button = gr.Button("Predict Shirt Measurements")
+def create_demo():
+    """Build the Gradio interface"""
+    import gradio as gr
+    
+    with gr.Blocks(title="Body Measurements Predictor") as demo:
+        gr.Markdown(f"""
+        # Body Measurements Predictor
+        Created by: {CURRENT_USER}
+        Last Updated: {CURRENT_TIME}
+        """)
+    
+        with gr.Tabs():
+            # First Tab - Shirt Measurements
+            with gr.Tab("Shirt Measurements"):
+                with gr.Row():
+                    with gr.Column():
+                        height_input = gr.Number(
+                            label="Height (cm) *",
+                            minimum=50,
+                            maximum=250,
+                            step=HEIGHT_STEP,
+                            value=170
+                        )
+                        weight_input = gr.Number(
+                            label="Weight (kg) (optional)",
+                            minimum=30,
+                            maximum=200,
+                            step=WEIGHT_STEP
+                        )
+                        body_type_input = gr.Dropdown(
+                            label="Body Type (optional)",
+                            choices=["Slim", "Regular", "Athletic", "Large"],
+                            value=None
+                        )
+                        predict_button = gr.Button("Predict Shirt Measurements")
                 
-                with gr.Column():
-                    output_markdown = gr.Markdown(label="Shirt Measurements Predictions")
-                with gr.Column(scale=2, min_width=300):
-                    model3d = gr.Model3D(
-                        value="jacket.glb",  # Path to your .glb file on server
-                        clear_color=[0.0, 0.0, 0.0, 0.0],  # Transparent background
-                        camera_position=[0, 0, 5],  # Initial camera position
-                        visible=False  # Initially hidden
+                    with gr.Column():
+                        output_markdown = gr.Markdown(label="Shirt Measurements Predictions")
+                    with gr.Column(scale=2, min_width=300):
+                        model3d = gr.Model3D(
+                            value=None,  # Loaded with the first prediction, see garment_model()
+                            clear_color=[0.0, 0.0, 0.0, 0.0],  # Transparent background
+                            camera_position=[0, 0, 5],  # Initial camera position
+                            visible=False  # Initially hidden
+                        )
+            
+                def update_model_visibility(height, weight, body_type):
+                    predictions = format_shirt_predictions(
+                        shirt_measurements(height, weight, body_type)
                     )
+                    return predictions, gr.update(value=garment_model("jacket"), visible=True)
             
-            def update_model_visibility(height, weight, body_type):
-                predictions = format_shirt_predictions(
-                    json.loads(predict_shirt_measurements(height, weight, body_type))
+                predict_button.click(
+                    fn=update_model_visibility,
+                    inputs=[height_input, weight_input, body_type_input],
+                    outputs=[output_markdown, model3d],
+                    concurrency_limit=PREDICTION_CONCURRENCY
                 )
-                return predictions, gr.update(visible=True)
             
-            predict_button.click(
-                fn=update_model_visibility,
-                inputs=[height_input, weight_input, body_type_input],
-                outputs=[output_markdown, model3d]
-            )
-            
-            gr.Markdown("""
-            ### Instructions:
-            1. Enter your height (required)
-            2. Optionally enter your weight and select your body type
-            3. Click "Predict Shirt Measurements" to get detailed predictions
-            """)
-        
-        # Second Tab - Brand Size Finder (Shirts)
-        with gr.Tab("Shirt Size Finder"):
-            with gr.Row():
-                with gr.Column():
-                    chest_input = gr.Number(
-                        label="Chest Circumference (cm)",
-                        minimum=80,
-                        maximum=120,
-                        step=0.5,
-                        value=95
-                    )
-                    waist_input = gr.Number(
-                        label="Waist Circumference (cm)",
-                        minimum=60,
-                        maximum=110,
-                        step=0.5,
-                        value=80
-                    )
-                    shoulder_input = gr.Number(
-                        label="Shoulder Width (cm)",
-                        minimum=35,
-                        maximum=55,
-                        step=0.5,
-                        value=43
-                    )
-                    brand_predict_button = gr.Button("Find Matching Sizes")
+                gr.Markdown("""
+                ### Instructions:
+                1. Enter your height (required)
+                2. Optionally enter your weight and select your body type
+                3. Click "Predict Shirt Measurements" to get detailed predictions
+                """)
+        
+            # Second Tab - Brand Size Finder (Shirts)
+            with gr.Tab("Shirt Size Finder"):
+                with gr.Row():
+                    with gr.Column():
+                        chest_input = gr.Number(
+                            label="Chest Circumference (cm)",
+                            minimum=80,
+                            maximum=120,
+                            step=MEASUREMENT_STEP,
+                            value=95
+                        )
+                        waist_input = gr.Number(
+                            label="Waist Circumference (cm)",
+                            minimum=60,
+                            maximum=110,
+                            step=MEASUREMENT_STEP,
+                            value=80
+                        )
+                        shoulder_input = gr.Number(
+                            label="Shoulder Width (cm)",
+                            minimum=35,
+                            maximum=55,
+                            step=MEASUREMENT_STEP,
+                            value=43
+                        )
+                        brand_predict_button = gr.Button("Find Matching Sizes")
                 
-                with gr.Column():
-                    brand_output_markdown = gr.Markdown(label="Brand Size Recommendations")
-                with gr.Column(scale=2, min_width=300):
-                    model3d = gr.Model3D(
-                        value="jacket.glb",  # Path to your .glb file on server
-                        clear_color=[0.0, 0.0, 0.0, 0.0],  # Transparent background
-                        camera_position=[0, 0, 5],  # Initial camera position
-                        visible=False  # Initially hidden
+                    with gr.Column():
+                        brand_output_markdown = gr.Markdown(label="Brand Size Recommendations")
+                    with gr.Column(scale=2, min_width=300):
+                        model3d = gr.Model3D(
+                            value=None,  # Loaded with the first prediction, see garment_model()
+                            clear_color=[0.0, 0.0, 0.0, 0.0],  # Transparent background
+                            camera_position=[0, 0, 5],  # Initial camera position
+                            visible=False  # Initially hidden
+                        )
+            
+                def update_model_visibility(chest, waist, shoulder):
+                    predictions = format_brand_predictions(
+                        brand_sizes(chest, waist, shoulder)
                     )
+                    return predictions, gr.update(value=garment_model("jacket"), visible=True)
             
-            def update_model_visibility(chest, waist, shoulder):
-                predictions = format_brand_predictions(
-                    json.loads(predict_brand_sizes(chest, waist, shoulder))
+                brand_predict_button.click(
+                    fn=update_model_visibility,
+                    inputs=[chest_input, waist_input, shoulder_input],
+                    outputs=[brand_output_markdown, model3d]
                 )
-                return predictions, gr.update(visible=True)
             
-            brand_predict_button.click(
-                fn=update_model_visibility,
-                inputs=[chest_input, waist_input, shoulder_input],
-                outputs=[brand_output_markdown, model3d]
-            )
-            
-            gr.Markdown("""
-            ### Instructions:
-            1. Enter your measurements:
-               - Chest circumference
-               - Waist circumference
-               - Shoulder width
-            2. Click "Find Matching Sizes" to see which sizes fit you across different brands
-            """)
-        
-        # Third Tab - Pants Measurements
-        with gr.Tab("Pants Measurements"):
-            with gr.Row():
-                with gr.Column():
-                    pants_height_input = gr.Number(
-                        label="Height (cm) *",
-                        minimum=50,
-                        maximum=250,
-                        step=1,
-                        value=170
-                    )
-                    pants_weight_input = gr.Number(
-                        label="Weight (kg) (optional)",
-                        minimum=30,
-                        maximum=200,
-                        step=0.1
-                    )
-                    pants_body_type_input = gr.Dropdown(
-                        label="Body Type (optional)",
-                        choices=["Slim", "Regular", "Athletic", "Large"],
-                        value=None
-                    )
-                    pants_predict_button = gr.Button("Predict Pants Measurements")
+                gr.Markdown("""
+                ### Instructions:
+                1. Enter your measurements:
+                   - Chest circumference
+                   - Waist circumference
+                   - Shoulder width
+                2. Click "Find Matching Sizes" to see which sizes fit you across different brands
+                """)
+        
+            # Third Tab - Pants Measurements
+            with gr.Tab("Pants Measurements"):
+                with gr.Row():
+                    with gr.Column():
+                        pants_height_input = gr.Number(
+                            label="Height (cm) *",
+                            minimum=50,
+                            maximum=250,
+                            step=HEIGHT_STEP,
+                            value=170
+                        )
+                        pants_weight_input = gr.Number(
+                            label="Weight (kg) (optional)",
+                            minimum=30,
+                            maximum=200,
+                            step=WEIGHT_STEP
+                        )
+                        pants_body_type_input = gr.Dropdown(
+                            label="Body Type (optional)",
+                            choices=["Slim", "Regular", "Athletic", "Large"],
+                            value=None
+                        )
+                        pants_predict_button = gr.Button("Predict Pants Measurements")
                 
-                with gr.Column():
-                    pants_output_markdown = gr.Markdown(label="Pants Measurements Predictions")
-                with gr.Column():
-                    model3d = gr.Model3D(
-                        value="pants.glb",  # Path to your .glb file on server
-                        clear_color=[0.0, 0.0, 0.0, 0.0],  # Transparent background
-                        camera_position=[0, 0, 5],  # Initial camera position
-                        visible=False  # Initially hidden
+                    with gr.Column():
+                        pants_output_markdown = gr.Markdown(label="Pants Measurements Predictions")
+                    with gr.Column():
+                        model3d = gr.Model3D(
+                            value=None,  # Loaded with the first prediction, see garment_model()
+                            clear_color=[0.0, 0.0, 0.0, 0.0],  # Transparent background
+                            camera_position=[0, 0, 5],  # Initial camera position
+                            visible=False  # Initially hidden
+                        )
+            
+                def update_model_visibility(height, weight, body_type):
+                    predictions = format_pants_predictions(
+                        pants_measurements(height, weight, body_type)
                     )
+                    return predictions, gr.update(value=garment_model("pants"), visible=True)
             
-            def update_model_visibility(height, weight, body_type):
-                predictions = format_pants_predictions(
-                    json.loads(predict_pants_measurements(height, weight, body_type))
+                pants_predict_button.click(
+                    fn=update_model_visibility,
+                    inputs=[pants_height_input, pants_weight_input, pants_body_type_input],
+                    outputs=[pants_output_markdown, model3d],
+                    concurrency_limit=PREDICTION_CONCURRENCY
                 )
-                return predictions, gr.update(visible=True)
             
-            pants_predict_button.click(
-                fn=update_model_visibility,
-                inputs=[pants_height_input, pants_weight_input, pants_body_type_input],
-                outputs=[pants_output_markdown, model3d]
-            )
+                gr.Markdown("""
+                ### Instructions:
+                1. Enter your height (required)
+                2. Optionally enter your weight and select your body type
+                3. Click "Predict Pants Measurements" to get detailed predictions
+                """)
+        
+            # Fourth Tab - Pants Size Finder
+            with gr.Tab("Pants Size Finder"):
+                with gr.Row():
+                    with gr.Column():
+                        pants_waist_input = gr.Number(
+                            label="Waist Circumference (cm)",
+                            minimum=60,
+                            maximum=120,
+                            step=MEASUREMENT_STEP,
+                            value=80
+                        )
+                        pants_leg_input = gr.Number(
+                            label="Leg Length (cm)",
+                            minimum=60,
+                            maximum=120,
+                            step=MEASUREMENT_STEP,
+                            value=98
+                        )
+                        pants_hips_input = gr.Number(
+                            label="Hips Circumference (cm)",
+                            minimum=80,
+                            maximum=140,
+                            step=MEASUREMENT_STEP,
+                            value=102
+                        )
+                        pants_brand_predict_button = gr.Button("Find Matching Pants Sizes")
+                
+                    with gr.Column():
+                        pants_brand_output_markdown = gr.Markdown(label="Pants Size Recommendations")
+                    with gr.Column():
+                        model3d = gr.Model3D(
+                            value=None,  # Loaded with the first prediction, see garment_model()
+                            clear_color=[0.0, 0.0, 0.0, 0.0],  # Transparent background
+                            camera_position=[0, 0, 5],  # Initial camera position
+                            visible=False  # Initially hidden
+                        )
             
-            gr.Markdown("""
-            ### Instructions:
-            1. Enter your height (required)
-            2. Optionally enter your weight and select your body type
-            3. Click "Predict Pants Measurements" to get detailed predictions
-            """)
-        
-        # Fourth Tab - Pants Size Finder
-        with gr.Tab("Pants Size Finder"):
-            with gr.Row():
-                with gr.Column():
-                    pants_waist_input = gr.Number(
-                        label="Waist Circumference (cm)",
-                        minimum=60,
-                        maximum=120,
-                        step=0.5,
-                        value=80
-                    )
-                    pants_leg_input = gr.Number(
-                        label="Leg Length (cm)",
-                        minimum=60,
-                        maximum=120,
-                        step=0.5,
-                        value=98
-                    )
-                    pants_hips_input = gr.Number(
-                        label="Hips Circumference (cm)",
-                        minimum=80,
-                        maximum=140,
-                        step=0.5,
-                        value=102
+                def update_model_visibility(waist, leg_length, hips):
+                    predictions = format_pants_brand_predictions(
+                        pants_sizes(waist, leg_length, hips)
                     )
-                    pants_brand_predict_button = gr.Button("Find Matching Pants Sizes")
+                    return predictions, gr.update(value=garment_model("pants"), visible=True)
+            
+                pants_brand_predict_button.click(
+                    fn=update_model_visibility,
+                    inputs=[pants_waist_input, pants_leg_input, pants_hips_input],
+                    outputs=[pants_brand_output_markdown, model3d]
+                )
+            
+                gr.Markdown("""
+                ### Instructions:
+                1. Enter your measurements:
+                   - Waist circumference
+                   - Leg length
+                   - Hips circumference
+                2. Click "Find Matching Pants Sizes" to see which sizes fit you across different brands
+                """)
+        
+            # Fifth Tab - Full Outfit
+            with gr.Tab("Full Outfit"):
+                with gr.Row():
+                    with gr.Column():
+                        outfit_height_input = gr.Number(
+                            label="Height (cm) *",
+                            minimum=50,
+                            maximum=250,
+                            step=HEIGHT_STEP,
+                            value=170
+                        )
+                        outfit_weight_input = gr.Number(
+                            label="Weight (kg) (optional)",
+                            minimum=30,
+                            maximum=200,
+                            step=WEIGHT_STEP
+                        )
+                        outfit_body_type_input = gr.Dropdown(
+                            label="Body Type (optional)",
+                            choices=["Slim", "Regular", "Athletic", "Large"],
+                            value=None
+                        )
+                        outfit_predict_button = gr.Button("Predict Full Outfit")
                 
-                with gr.Column():
-                    pants_brand_output_markdown = gr.Markdown(label="Pants Size Recommendations")
-                with gr.Column():
-                    model3d = gr.Model3D(
-                        value="pants.glb",  # Path to your .glb file on server
-                        clear_color=[0.0, 0.0, 0.0, 0.0],  # Transparent background
-                        camera_position=[0, 0, 5],  # Initial camera position
-                        visible=False  # Initially hidden
-                    )
+                    with gr.Column(scale=2):
+                        outfit_output_markdown = gr.Markdown(label="Full Outfit Predictions")
             
-            def update_model_visibility(waist, leg_length, hips):
-                predictions = format_pants_brand_predictions(
-                    json.loads(predict_pants_sizes(waist, leg_length, hips))
+                def show_outfit(height, weight, body_type):
+                    return format_outfit_predictions(outfit(height, weight, body_type))
+            
+                outfit_predict_button.click(
+                    fn=show_outfit,
+                    inputs=[outfit_height_input, outfit_weight_input, outfit_body_type_input],
+                    outputs=outfit_output_markdown,
+                    api_name="outfit",
+                    concurrency_limit=PREDICTION_CONCURRENCY
                 )
-                return predictions, gr.update(visible=True)  # Fixed syntax error here
             
-            pants_brand_predict_button.click(
-                fn=update_model_visibility,
-                inputs=[pants_waist_input, pants_leg_input, pants_hips_input],
-                outputs=[pants_brand_output_markdown, model3d]
-            )
+                gr.Markdown("""
+                ### Instructions:
+                1. Enter your height (required)
+                2. Optionally enter your weight and select your body type
+                3. Click "Predict Full Outfit" to get shirt and pants measurements and the matching brand sizes for both
+                """)
+        
+            # Sixth Tab - Batch Predictions
+            with gr.Tab("Batch Predictions"):
+                with gr.Row():
+                    with gr.Column():
+                        batch_heights_input = gr.Textbox(
+                            label="Heights (cm)",
+                            placeholder="160, 165.5, 170, 182",
+                            lines=4
+                        )
+                        batch_garment_input = gr.Radio(
+                            label="Garment",
+                            choices=["shirt", "pants"],
+                            value="shirt"
+                        )
+                        batch_predict_button = gr.Button("Predict Batch")
+                
+                    with gr.Column(scale=2):
+                        batch_output = gr.Dataframe(label="Batch Predictions")
             
-            gr.Markdown("""
-            ### Instructions:
-            1. Enter your measurements:
-               - Waist circumference
-               - Leg length
-               - Hips circumference
-            2. Click "Find Matching Pants Sizes" to see which sizes fit you across different brands
-            """)
+                batch_predict_button.click(
+                    fn=predict_measurements_batch,
+                    inputs=[batch_heights_input, batch_garment_input],
+                    outputs=batch_output,
+                    api_name="predict_measurements_batch"
+                )
+            
+                gr.Markdown("""
+                ### Instructions:
+                1. Paste a list of heights separated by commas, spaces or new lines
+                2. Choose the garment to predict measurements for
+                3. Click "Predict Batch" to get one row of predictions per height
+                """)
+    
+    return demo
+
+def create_api():
+    """
+    Plain JSON endpoints for the predictors, served next to the Gradio
+    UI without going through its queue
+    """
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse, Response
+    
+    api = FastAPI(title="Body Measurements Predictor API")
+    
+    def respond(payload, predictor):
+        # JSONResponse serializes compactly and skips FastAPI's response validation
+        with STAGE_SECONDS.time(predictor, "serialization"):
+            return JSONResponse(payload, status_code=payload.get("status", 500) if "error" in payload else 200)
+    
+    @api.get("/healthz")
+    def health_endpoint():
+        return JSONResponse({"status": "ok"})
+    
+    @api.get("/readyz")
+    def readiness_endpoint():
+        state = readiness()
+        return JSONResponse(state, status_code=200 if state["ready"] else 503)
+    
+    @api.get("/api/v1/shirt-measurements")
+    def shirt_measurements_endpoint(height: float, weight: Optional[float] = None, body_type: Optional[str] = None):
+        return respond(shirt_measurements(height, weight, body_type), "shirt")
+    
+    @api.get("/api/v1/shirt-sizes")
+    def shirt_sizes_endpoint(chest: float, waist: float, shoulder: float):
+        return respond(brand_sizes(chest, waist, shoulder), "shirt_sizes")
+    
+    @api.get("/api/v1/pants-measurements")
+    def pants_measurements_endpoint(height: float, weight: Optional[float] = None, body_type: Optional[str] = None):
+        return respond(pants_measurements(height, weight, body_type), "pants")
+    
+    @api.get("/api/v1/pants-sizes")
+    def pants_sizes_endpoint(waist: float, leg_length: float, hips: float):
+        return respond(pants_sizes(waist, leg_length, hips), "pants_sizes")
+    
+    @api.get("/api/v1/outfit")
+    def outfit_endpoint(height: float, weight: Optional[float] = None, body_type: Optional[str] = None):
+        return respond(outfit(height, weight, body_type), "outfit")
+    
+    @api.get("/api/v1/cache-stats")
+    def cache_stats_endpoint():
+        return JSONResponse(cache_stats())
+    
+    @api.get("/metrics")
+    def metrics_endpoint():
+        return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+    
+    # Built 3D assets, when asset_pipeline.py has been run
+    manifest = static_assets.AssetManifest.load(ASSET_BUILD_DIR)
+    if manifest is not None:
+        static_assets.add_asset_routes(api, manifest, ASSET_LOD)
+    
+    return api
+
+def create_app(warm=True):
+    """
+    Application factory: JSON API, health checks and the Gradio UI on one
+    ASGI app. With warm=True the predictors start loading in the background
+    right away and /readyz reports when they are done.
+    """
+    import gradio as gr
+    
+    if warm:
+        warm_up()
+    return gr.mount_gradio_app(create_api(), create_demo(), path="/")
 
 if __name__ == "__main__":
-    logger.info("Starting Gradio interface...")
-    demo.launch()
+    import uvicorn
+    
+    host = os.environ.get("GRADIO_SERVER_NAME", "127.0.0.1")
+    port = int(os.environ.get("GRADIO_SERVER_PORT", "7860"))
+    if WEB_WORKERS > 1 and hasattr(os, "fork"):
+        logger.info("Starting Gradio interface with %s workers...", WEB_WORKERS)
+        PreforkServer(
+            lambda: create_app(warm=False), host, port, WEB_WORKERS,
+            prepare=prepare_workers, worker_init=start_worker
+        ).run()
+    else:
+        logger.info("Starting Gradio interface...")
+        uvicorn.run(create_app(), host=host, port=port)
@@ -0,0 +1,423 @@
+"""
+Build step for the 3D garment assets
+
+Turns each source .glb into several levels of detail for the web UI:
+meshes are simplified by vertex clustering (UV seams and hard edges are kept
+apart), vertex attributes are quantized with KHR_mesh_quantization (16-bit
+positions, 8-bit normals and tangents, 16-bit texture coordinates) and
+textures are downscaled and re-encoded. Every output is named after its
+content hash so it can be cached forever, written with gzip and brotli
+variants next to it, and listed in a manifest.json that the app reads to
+serve them (see static_assets.py).
+
+Run from the repository root:
+Usage: python AIModel/asset_pipeline.py [--output DIR] [--no-quantize] [jacket.glb pants.glb ...]
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import struct
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SOURCE_ASSETS = ['jacket.glb', 'pants.glb']
+BUILD_DIR = os.environ.get("ASSET_BUILD_DIR", 'assets_build')
+MANIFEST_NAME = 'manifest.json'
+# Share of triangles kept and largest texture side for each level of detail
+LEVELS = [
+    {"triangle_ratio": 1.0, "texture_size": 1024, "jpeg_quality": 90},
+    {"triangle_ratio": 0.5, "texture_size": 512, "jpeg_quality": 85},
+    {"triangle_ratio": 0.25, "texture_size": 256, "jpeg_quality": 80}
+]
+# Primitives smaller than this are never simplified
+MIN_SIMPLIFY_TRIANGLES = 500
+
+GLB_MAGIC = 0x46546C67
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+TRIANGLES = 4
+
+BYTE, UNSIGNED_BYTE, SHORT, UNSIGNED_SHORT, UNSIGNED_INT, FLOAT = 5120, 5121, 5122, 5123, 5125, 5126
+COMPONENT_DTYPES = {
+    BYTE: np.int8, UNSIGNED_BYTE: np.uint8, SHORT: np.int16,
+    UNSIGNED_SHORT: np.uint16, UNSIGNED_INT: np.uint32, FLOAT: np.float32
+}
+DTYPE_COMPONENTS = {np.dtype(dtype): component for component, dtype in COMPONENT_DTYPES.items()}
+TYPE_WIDTHS = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+WIDTH_TYPES = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4"}
+
+
+def read_glb(path):
+    """The glTF JSON and binary chunk of a .glb file"""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, _ = struct.unpack_from("<III", data, 0)
+    if magic != GLB_MAGIC or version != 2:
+        raise ValueError(f"{path} is not a glTF 2.0 binary file")
+
+    gltf, binary, offset = None, b"", 12
+    while offset < len(data):
+        length, kind = struct.unpack_from("<II", data, offset)
+        chunk = data[offset + 8:offset + 8 + length]
+        if kind == CHUNK_JSON:
+            gltf = json.loads(chunk)
+        elif kind == CHUNK_BIN:
+            binary = chunk
+        offset += 8 + length
+    if any("uri" in buffer for buffer in gltf.get("buffers", [])):
+        raise ValueError(f"{path} references external buffers, which are not supported")
+    return gltf, binary
+
+
+def write_glb(gltf, binary):
+    """A .glb file from glTF JSON and one binary buffer"""
+    text = json.dumps(gltf, separators=(",", ":")).encode()
+    text += b" " * (-len(text) % 4)
+    binary += b"\0" * (-len(binary) % 4)
+    length = 12 + 8 + len(text) + (8 + len(binary) if binary else 0)
+    parts = [struct.pack("<III", GLB_MAGIC, 2, length), struct.pack("<II", len(text), CHUNK_JSON), text]
+    if binary:
+        parts += [struct.pack("<II", len(binary), CHUNK_BIN), binary]
+    return b"".join(parts)
+
+
+def read_accessor(gltf, binary, index):
+    """Accessor data as a (count, width) array, normalized integers converted to floats"""
+    accessor = gltf["accessors"][index]
+    if "sparse" in accessor or "bufferView" not in accessor:
+        raise ValueError(f"Accessor {index} is sparse or empty, which is not supported")
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    dtype = np.dtype(COMPONENT_DTYPES[accessor["componentType"]])
+    width = TYPE_WIDTHS[accessor["type"]]
+    stride = view.get("byteStride") or dtype.itemsize * width
+    data = np.array(np.ndarray(
+        (accessor["count"], width), dtype=dtype, buffer=binary,
+        offset=view.get("byteOffset", 0) + accessor.get("byteOffset", 0),
+        strides=(stride, dtype.itemsize)
+    ))
+    if accessor.get("normalized"):
+        data = np.maximum(data / np.iinfo(dtype).max, -1.0).astype(np.float32)
+    return data
+
+
+class BufferWriter:
+    """Collects buffer views and accessors for a new binary buffer"""
+
+    def __init__(self, gltf):
+        self.gltf = gltf
+        gltf["bufferViews"], gltf["accessors"] = [], []
+        self.parts = []
+        self.length = 0
+
+    def view(self, data, target=None, stride=None):
+        self.parts.append(b"\0" * (-self.length % 4))
+        self.length += len(self.parts[-1])
+        view = {"buffer": 0, "byteOffset": self.length, "byteLength": len(data)}
+        if target is not None:
+            view["target"] = target
+        if stride is not None:
+            view["byteStride"] = stride
+        self.parts.append(data)
+        self.length += len(data)
+        self.gltf["bufferViews"].append(view)
+        return len(self.gltf["bufferViews"]) - 1
+
+    def accessor(self, array, target=ARRAY_BUFFER, normalized=False, bounds=False, pad_to=None):
+        """Accessor over a (count, width) array; pad_to widens each element for 4-byte alignment"""
+        array = np.ascontiguousarray(array)
+        count, width = array.shape
+        stride = None
+        if pad_to is not None and pad_to > width:
+            padded = np.zeros((count, pad_to), dtype=array.dtype)
+            padded[:, :width] = array
+            stride = pad_to * array.dtype.itemsize
+            data = padded.tobytes()
+        else:
+            data = array.tobytes()
+            if target == ARRAY_BUFFER and (width * array.dtype.itemsize) % 4:
+                raise ValueError("Vertex attribute elements must be 4-byte aligned")
+        accessor = {
+            "bufferView": self.view(data, target, stride),
+            "componentType": DTYPE_COMPONENTS[array.dtype],
+            "count": count,
+            "type": WIDTH_TYPES[width]
+        }
+        if normalized:
+            accessor["normalized"] = True
+        if bounds:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        self.gltf["accessors"].append(accessor)
+        return len(self.gltf["accessors"]) - 1
+
+    def data(self):
+        return b"".join(self.parts)
+
+
+def cluster_vertices(attributes, triangles, cell):
+    """
+    Merge the vertices that fall into one grid cell of the given size. UVs and
+    normals are part of the cell key, so vertices on either side of a UV seam
+    or a hard edge are not merged. Returns the merged attributes and triangles.
+    """
+    positions = attributes["POSITION"]
+    lower = positions.min(axis=0)
+    keys = [np.floor((positions - lower) / cell)]
+    extent = float(np.linalg.norm(positions.max(axis=0) - lower)) or 1.0
+    for name, values in attributes.items():
+        if name.startswith("TEXCOORD_"):
+            uv_extent = float(np.linalg.norm(values.max(axis=0) - values.min(axis=0))) or 1.0
+            keys.append(np.floor(values / (2 * cell * uv_extent / extent)))
+        elif name == "NORMAL":
+            keys.append(np.floor((values + 1) * 1.5))
+    _, cluster, counts = np.unique(
+        np.hstack(keys).astype(np.int64), axis=0, return_inverse=True, return_counts=True
+    )
+    cluster = cluster.reshape(-1)
+
+    merged = {}
+    for name, values in attributes.items():
+        total = np.zeros((len(counts), values.shape[1]))
+        np.add.at(total, cluster, values)
+        merged[name] = total / counts[:, None]
+        if name == "NORMAL":
+            merged[name] /= np.maximum(np.linalg.norm(merged[name], axis=1, keepdims=True), 1e-12)
+        elif name == "TANGENT":
+            merged[name][:, :3] /= np.maximum(np.linalg.norm(merged[name][:, :3], axis=1, keepdims=True), 1e-12)
+            merged[name][:, 3] = np.where(merged[name][:, 3] < 0, -1.0, 1.0)
+
+    triangles = cluster[triangles]
+    triangles = triangles[
+        (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+    ]
+    # The same triangle can come out of several source triangles
+    _, first = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+    return merged, triangles[np.sort(first)]
+
+
+def simplify(attributes, triangles, ratio):
+    """Vertex clustering with the grid cell size searched to keep about `ratio` of the triangles"""
+    target = int(len(triangles) * ratio)
+    positions = attributes["POSITION"]
+    extent = float(np.linalg.norm(positions.max(axis=0) - positions.min(axis=0))) or 1.0
+    best = (attributes, triangles)
+    low, high = np.log(1e-5), np.log(0.25)
+    for _ in range(16):
+        cell = extent * np.exp((low + high) / 2)
+        merged, merged_triangles = cluster_vertices(attributes, triangles, cell)
+        if len(merged_triangles) >= target:
+            best = (merged, merged_triangles)
+            low = np.log(cell / extent)
+        else:
+            high = np.log(cell / extent)
+    return best
+
+
+def compact(attributes, triangles):
+    """Drop vertices no triangle uses and renumber the rest"""
+    used, triangles = np.unique(triangles, return_inverse=True)
+    return {name: values[used] for name, values in attributes.items()}, triangles.reshape(-1, 3)
+
+
+def encode_image(data, size, jpeg_quality):
+    """Downscale an image to at most size x size and re-encode it; returns (bytes, MIME type)"""
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if max(image.size) > size:
+        scale = size / max(image.size)
+        image = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS
+        )
+    out = io.BytesIO()
+    # Keep PNG only where the alpha channel is actually used
+    if image.mode in ("RGBA", "LA", "P") and image.convert("RGBA").getextrema()[3][0] < 255:
+        image.save(out, "PNG", optimize=True)
+        return out.getvalue(), "image/png"
+    image.convert("RGB").save(out, "JPEG", quality=jpeg_quality, optimize=True, progressive=True)
+    return out.getvalue(), "image/jpeg"
+
+
+def build_level(gltf, binary, triangle_ratio=1.0, texture_size=1024, jpeg_quality=90, quantize=True):
+    """One level of detail of a parsed .glb; returns the new .glb bytes and its triangle count"""
+    source = gltf
+    gltf = json.loads(json.dumps(source))
+    writer = BufferWriter(gltf)
+    skinned = {node["mesh"] for node in gltf.get("nodes", []) if "mesh" in node and "skin" in node}
+    quantized = False
+    triangle_count = 0
+
+    for mesh_index, mesh in enumerate(gltf.get("meshes", [])):
+        primitives = []
+        for primitive in mesh["primitives"]:
+            attributes = {
+                name: read_accessor(source, binary, index).astype(np.float64)
+                for name, index in primitive["attributes"].items()
+            }
+            if primitive.get("mode", TRIANGLES) != TRIANGLES or "targets" in primitive:
+                raise ValueError(f"Mesh {mesh.get('name', mesh_index)} is not a plain triangle mesh")
+            if "indices" in primitive:
+                triangles = read_accessor(source, binary, primitive["indices"]).reshape(-1, 3).astype(np.int64)
+            else:
+                triangles = np.arange(len(attributes["POSITION"])).reshape(-1, 3)
+            if triangle_ratio < 1 and len(triangles) >= MIN_SIMPLIFY_TRIANGLES:
+                attributes, triangles = simplify(attributes, triangles, triangle_ratio)
+            attributes, triangles = compact(attributes, triangles)
+            triangle_count += len(triangles)
+            primitives.append((primitive, attributes, triangles))
+
+        # One dequantization transform per mesh, so all its primitives share the node
+        transform = None
+        if quantize and mesh_index not in skinned:
+            positions = np.vstack([attributes["POSITION"] for _, attributes, _ in primitives])
+            lower, upper = positions.min(axis=0), positions.max(axis=0)
+            center = (lower + upper) / 2
+            step = (float((upper - lower).max()) / 2 or 1.0) / 32767
+            transform = (center, step)
+
+        for primitive, attributes, triangles in primitives:
+            encoded = {}
+            for name, values in attributes.items():
+                if transform is not None and name == "POSITION":
+                    center, step = transform
+                    ints = np.clip(np.round((values - center) / step), -32767, 32767).astype(np.int16)
+                    encoded[name] = writer.accessor(ints, bounds=True, pad_to=4)
+                elif quantize and name in ("NORMAL", "TANGENT"):
+                    ints = np.clip(np.round(values * 127), -127, 127).astype(np.int8)
+                    encoded[name] = writer.accessor(ints, normalized=True, pad_to=4)
+                elif quantize and name.startswith("TEXCOORD_") and values.min() >= 0 and values.max() <= 1:
+                    ints = np.round(values * 65535).astype(np.uint16)
+                    encoded[name] = writer.accessor(ints, normalized=True)
+                else:
+                    encoded[name] = writer.accessor(values.astype(np.float32), bounds=name == "POSITION")
+            quantized = quantized or quantize
+            primitive["attributes"] = encoded
+            index_dtype = np.uint16 if len(attributes["POSITION"]) < 65536 else np.uint32
+            primitive["indices"] = writer.accessor(
+                triangles.reshape(-1, 1).astype(index_dtype), target=ELEMENT_ARRAY_BUFFER
+            )
+            primitive.pop("mode", None)
+
+        if transform is not None:
+            center, step = transform
+            for node in list(gltf["nodes"]):
+                if node.get("mesh") == mesh_index:
+                    del node["mesh"]
+                    gltf["nodes"].append({
+                        "name": f"{mesh.get('name', 'mesh')}_dequantize",
+                        "mesh": mesh_index,
+                        "translation": center.tolist(),
+                        "scale": [step] * 3
+                    })
+                    node.setdefault("children", []).append(len(gltf["nodes"]) - 1)
+
+    for image in gltf.get("images", []):
+        if "bufferView" not in image:
+            continue
+        view = source["bufferViews"][image["bufferView"]]
+        start = view.get("byteOffset", 0)
+        data, mime_type = encode_image(binary[start:start + view["byteLength"]], texture_size, jpeg_quality)
+        image["bufferView"] = writer.view(data)
+        image["mimeType"] = mime_type
+
+    if quantized:
+        for key in ["extensionsUsed", "extensionsRequired"]:
+            if "KHR_mesh_quantization" not in gltf.setdefault(key, []):
+                gltf[key].append("KHR_mesh_quantization")
+    data = writer.data()
+    gltf["buffers"] = [{"byteLength": len(data)}] if data else []
+    return write_glb(gltf, data), triangle_count
+
+
+def write_variants(directory, name, data):
+    """Write a file with precompressed gzip and (when available) brotli variants next to it"""
+    variants = {"identity": data, "gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+        variants["br"] = brotli.compress(data, quality=11)
+    except ImportError:
+        logger.warning("brotli is not installed; only gzip variants are written")
+
+    files = {}
+    for encoding, content in variants.items():
+        # Keep a compressed variant only if it actually saves bytes
+        if encoding != "identity" and len(content) >= len(data):
+            continue
+        filename = name + {"identity": "", "gzip": ".gz", "br": ".br"}[encoding]
+        with open(os.path.join(directory, filename), "wb") as f:
+            f.write(content)
+        files[encoding] = {"file": filename, "bytes": len(content)}
+    return files
+
+
+def build_asset(path, output_dir, levels=LEVELS, quantize=True):
+    """Build every level of detail of one .glb; returns its manifest entry"""
+    with open(path, "rb") as f:
+        source_bytes = f.read()
+    gltf, binary = read_glb(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    entry = {
+        "source": os.path.basename(path),
+        "source_bytes": len(source_bytes),
+        "source_sha256": hashlib.sha256(source_bytes).hexdigest(),
+        "levels": []
+    }
+    for lod, level in enumerate(levels):
+        data, triangles = build_level(gltf, binary, quantize=quantize, **level)
+        digest = hashlib.sha256(data).hexdigest()
+        filename = f"{name}.lod{lod}.{digest[:12]}.glb"
+        entry["levels"].append(dict(
+            level, lod=lod, file=filename, sha256=digest, bytes=len(data), triangles=triangles,
+            encodings=write_variants(output_dir, filename, data)
+        ))
+        logger.info("Built %s: %s bytes, %s triangles", filename, len(data), triangles)
+    return entry
+
+
+def build_assets(paths=SOURCE_ASSETS, output_dir=BUILD_DIR, levels=LEVELS, quantize=True):
+    """Build all assets into output_dir, replacing the manifest and removing outdated builds"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {"version": 1, "assets": {}}
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        manifest["assets"][name] = build_asset(path, output_dir, levels, quantize)
+
+    current = {MANIFEST_NAME} | {
+        variant["file"] for entry in manifest["assets"].values()
+        for level in entry["levels"] for variant in level["encodings"].values()
+    }
+    for filename in os.listdir(output_dir):
+        if filename not in current and filename.split(".")[0] in manifest["assets"]:
+            os.remove(os.path.join(output_dir, filename))
+
+    temporary = os.path.join(output_dir, MANIFEST_NAME + ".tmp")
+    with open(temporary, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temporary, os.path.join(output_dir, MANIFEST_NAME))
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("assets", nargs="*", default=SOURCE_ASSETS, help="source .glb files")
+    parser.add_argument("--output", default=BUILD_DIR, help="build directory")
+    parser.add_argument("--no-quantize", action="store_true", help="keep float vertex attributes")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    manifest = build_assets(args.assets, args.output, quantize=not args.no_quantize)
+    for name, entry in manifest["assets"].items():
+        print(f"{name}: {entry['source_bytes']} bytes")
+        for level in entry["levels"]:
+            encodings = ", ".join(f"{encoding} {variant['bytes']}" for encoding, variant in level["encodings"].items())
+            print(f"  lod{level['lod']} {level['file']}: {level['triangles']} triangles, {encodings}")
@@ -0,0 +1,330 @@
+"""
+Benchmark suite for the measurement predictors and size matching
+
+Measures cold start, training time, per-call and batch predict latency,
+throughput of concurrent callers with and without micro-batching and
+size-matching throughput against synthetic size charts, with the peak
+memory of each step, and the memory each forked worker adds when serving
+with WEB_WORKERS. Results are written as one flat JSON object so runs
+from different commits can be compared, and --baseline reports every
+metric that got worse by more than the tolerance.
+
+Run from the repository root:
+Usage: python AIModel/benchmarks.py [--quick] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+import app
+from app import (
+    BrandSizePredictor, PantsPredictor, PantsSizePredictor, ShirtPredictor,
+    BATCH_MAX_SIZE, BATCH_WINDOW, PANTS_SIZE_DIMENSIONS, PANTS_SIZE_TOLERANCE, SHIRT_SIZE_DIMENSIONS
+)
+from micro_batcher import MicroBatcher
+from size_index import load_size_index
+
+BRAND_COUNTS = [3, 100, 1000, 10000]
+CONCURRENCY_LEVELS = [1, 8, 32]
+SIZE_LABELS = ["XS", "S", "M", "L", "XL", "XXL"]
+# Typical centre and per-size step of each chart dimension, in cm
+CHART_SHAPES = {
+    "chest": (96, 6), "waist": (80, 5), "shoulder": (44, 1.5),
+    "hips": (100, 5), "leg_length": (101, 2)
+}
+
+# Started in a fresh interpreter so imports and model loading are really cold
+COLD_START_SCRIPT = """
+import json, resource, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.initialize()
+ready = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "ready_seconds": ready - start,
+    "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+}))
+"""
+
+
+def synthetic_charts(brands, dimensions, seed=0):
+    """Size charts for `brands` brands with slightly shifted, realistic ranges"""
+    rng = np.random.RandomState(seed)
+    charts = []
+    for b in range(brands):
+        labels = SIZE_LABELS[rng.randint(0, 2):rng.randint(4, len(SIZE_LABELS) + 1)]
+        offset = rng.uniform(-3, 3)
+        sizes = []
+        for i, label in enumerate(labels):
+            size = {"label": label}
+            for dim in dimensions:
+                centre, step = CHART_SHAPES[dim]
+                low = centre + offset * step / 3 + (i - 2) * step
+                size[dim] = [round(low, 1), round(low + step * rng.uniform(0.7, 1.0), 1)]
+            sizes.append(size)
+        charts.append({"brand": f"Brand {b}", "sizes": sizes})
+    return charts
+
+
+def latency_summary(samples, prefix):
+    samples = np.asarray(samples) * 1000
+    return {
+        f"{prefix}_mean_ms": round(float(samples.mean()), 4),
+        f"{prefix}_p50_ms": round(float(np.percentile(samples, 50)), 4),
+        f"{prefix}_p95_ms": round(float(np.percentile(samples, 95)), 4)
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def peak_memory(fn, *args):
+    """Peak Python heap allocated while running fn, in bytes (numpy buffers included)"""
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_cold_start():
+    results = {}
+    with tempfile.TemporaryDirectory() as store:
+        # First start trains and saves the models, the second loads the artifact
+        for phase in ["train", "load"]:
+            env = dict(
+                os.environ, MODEL_STORE_DIR=store,
+                PYTHONPATH=os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH")]))
+            )
+            out = subprocess.run(
+                [sys.executable, "-c", COLD_START_SCRIPT],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+            metrics = json.loads(out.strip().splitlines()[-1])
+            results[f"cold_start.{phase}.import_seconds"] = round(metrics["import_seconds"], 3)
+            results[f"cold_start.{phase}.ready_seconds"] = round(metrics["ready_seconds"], 3)
+            results[f"cold_start.{phase}.peak_rss_bytes"] = metrics["peak_rss_bytes"]
+    return results
+
+
+def bench_predictors(requests, batch_size):
+    results = {}
+    heights = np.random.RandomState(0).uniform(150, 200, max(requests, batch_size))
+    for predictor_cls in [ShirtPredictor, PantsPredictor]:
+        predictor = predictor_cls()
+        prefix = f"predict.{predictor.name}"
+        results[f"train.{predictor.name}.seconds"] = round(timed(predictor.train), 3)
+        results[f"train.{predictor.name}.peak_bytes"] = peak_memory(predictor_cls().train)
+
+        predictor.predict(heights[0])
+        results.update(latency_summary(
+            [timed(predictor.predict, height) for height in heights[:requests]], f"{prefix}.call"
+        ))
+        results.update(latency_summary(
+            [timed(predictor.predict_many, heights[:batch_size]) for _ in range(5)],
+            f"{prefix}.batch_{batch_size}"
+        ))
+        results[f"{prefix}.call_peak_bytes"] = peak_memory(predictor.predict, heights[0])
+        results[f"{prefix}.batch_{batch_size}_peak_bytes"] = peak_memory(predictor.predict_many, heights[:batch_size])
+    return results
+
+
+def bench_concurrency(requests, levels):
+    """Throughput of concurrent predict() callers, called directly and through the micro-batcher"""
+    results = {}
+    heights = np.random.RandomState(3).uniform(150, 200, requests)
+    predictor = ShirtPredictor()
+    predictor.train()
+    batcher = MicroBatcher(predictor.predict_batch, BATCH_WINDOW, BATCH_MAX_SIZE)
+    for mode, call in [
+        ("direct", predictor.predict),
+        ("batched", lambda height: batcher.submit((height, None, None)))
+    ]:
+        for level in levels:
+            with ThreadPoolExecutor(level) as pool:
+                start = time.perf_counter()
+                list(pool.map(call, heights))
+                seconds = time.perf_counter() - start
+            results[f"concurrency.{mode}.threads_{level}_per_second"] = round(requests / seconds, 1)
+    return results
+
+
+def bench_size_matching(brand_counts, queries):
+    results = {}
+    rng = np.random.RandomState(1)
+    with tempfile.TemporaryDirectory() as tmp:
+        for brands in brand_counts:
+            for garment, predictor_cls, dimensions, tolerance in [
+                ("shirt", BrandSizePredictor, SHIRT_SIZE_DIMENSIONS, 0),
+                ("pants", PantsSizePredictor, PANTS_SIZE_DIMENSIONS, PANTS_SIZE_TOLERANCE)
+            ]:
+                path = os.path.join(tmp, f"{garment}-{brands}.json")
+                with open(path, "w") as f:
+                    json.dump(synthetic_charts(brands, dimensions), f)
+                prefix = f"size_matching.{garment}.brands_{brands}"
+
+                # Each load path on its own: parsing the JSON with no compiled copy
+                # present, then memory-mapping the compiled copy, whose mapped pages
+                # are not Python heap and so not part of its peak bytes
+                load = lambda: load_size_index(path, dimensions, tolerance, compile=False)
+                results[f"{prefix}.json_load_seconds"] = round(timed(load), 4)
+                results[f"{prefix}.json_load_peak_bytes"] = peak_memory(load)
+                load_size_index(path, dimensions, tolerance)
+                results[f"{prefix}.compiled_load_seconds"] = round(timed(load), 4)
+                results[f"{prefix}.compiled_load_peak_bytes"] = peak_memory(load)
+
+                predictor = predictor_cls(path)
+
+                # Points around the chart centres, so most of them match some sizes
+                points = [
+                    {dim: float(CHART_SHAPES[dim][0] + rng.normal(0, 2 * CHART_SHAPES[dim][1])) for dim in dimensions}
+                    for _ in range(queries)
+                ]
+                calls = [("find_matching_sizes", predictor.find_matching_sizes)]
+                if garment == "pants":
+                    calls.append(("find_closest_matches", predictor._find_closest_matches))
+                for name, fn in calls:
+                    seconds = sum(timed(fn, point) for point in points)
+                    results[f"{prefix}.{name}_per_second"] = round(queries / seconds, 1)
+                    results[f"{prefix}.{name}_peak_bytes"] = peak_memory(fn, points[0])
+    return results
+
+
+def bench_worker_memory(workers, requests):
+    """
+    Memory of forked workers sharing the parent's models, as in WEB_WORKERS
+    serving: private bytes are what each extra worker really adds
+    """
+    from prefork import fork, memory_usage
+
+    app.initialize()
+    app.chart_watcher.stop()
+    gc.collect()
+    gc.freeze()
+    heights = np.random.RandomState(2).uniform(150, 200, requests)
+    report_read, report_write = os.pipe()
+    release_read, release_write = os.pipe()
+
+    def worker():
+        os.close(release_write)
+        for height in heights:
+            app.shirt_predictor.predict(height)
+            app.pants_predictor.predict(height)
+        os.write(report_write, (json.dumps(memory_usage()) + "\n").encode())
+        # Stay alive until every worker has measured, so shared pages count as shared
+        os.read(release_read, 1)
+
+    results = {
+        "workers.model_bytes": app.measurement_models.memory_report()["total"]["bytes"],
+        "workers.parent_rss_bytes": memory_usage()["rss"]
+    }
+    pids = [fork(worker) for _ in range(workers)]
+    with os.fdopen(report_read) as reports:
+        usages = [json.loads(reports.readline()) for _ in pids]
+    os.close(release_write)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    os.close(release_read)
+    os.close(report_write)
+    gc.unfreeze()
+
+    for key in ["private", "pss", "rss"]:
+        results[f"workers.{workers}.worker_{key}_bytes"] = int(np.mean([usage[key] for usage in usages]))
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    import sklearn
+    return {
+        "commit": commit,
+        "timestamp_utc": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "predictor_mode": app.PREDICTOR_MODE,
+        "model_layout": app.MODEL_LAYOUT
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """Metrics that got worse than the baseline by more than the tolerance (a fraction)"""
+    worse = {}
+    for name, value in results.items():
+        previous = baseline.get(name)
+        if not isinstance(previous, (int, float)) or previous <= 0:
+            continue
+        # Throughputs should not drop; times and memory should not grow
+        ratio = previous / value if name.endswith("_per_second") else value / previous
+        if ratio > 1 + tolerance:
+            worse[name] = {"baseline": previous, "current": value, "ratio": round(ratio, 3)}
+    return worse
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer requests and brands, no cold start")
+    parser.add_argument("--requests", type=int, default=500, help="predict() calls used for latency")
+    parser.add_argument("--batch-size", type=int, default=1000, help="heights per predict_many() call")
+    parser.add_argument("--queries", type=int, default=200, help="size-matching calls per chart size")
+    parser.add_argument("--workers", type=int, default=4, help="forked workers for the shared model memory benchmark")
+    parser.add_argument("--brands", default=",".join(map(str, BRAND_COUNTS)), help="comma separated brand counts")
+    parser.add_argument("--output", help="write the results JSON to this file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a metric is reported")
+    parser.add_argument("--log-level", default="ERROR", help="log level of the predictors while benchmarking")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
+
+    brand_counts = [int(count) for count in args.brands.split(",")]
+    if args.quick:
+        args.requests, args.queries = min(args.requests, 100), min(args.queries, 50)
+        brand_counts = [count for count in brand_counts if count <= 1000]
+
+    results = {}
+    if not args.quick:
+        results.update(bench_cold_start())
+    results.update(bench_predictors(args.requests, args.batch_size))
+    results.update(bench_concurrency(min(args.requests, 200), CONCURRENCY_LEVELS))
+    results.update(bench_size_matching(brand_counts, args.queries))
+    if not args.quick and os.path.exists("/proc/self/smaps_rollup"):
+        results.update(bench_worker_memory(args.workers, args.requests))
+    report = {"meta": metadata(), "results": results}
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = regressions(results, json.load(f)["results"], args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if report.get("regressions"):
+        sys.exit(1)
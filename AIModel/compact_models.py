@@ -0,0 +1,79 @@
+"""
+Forest compaction report for the measurement models
+
+Trains the current models, prints the memory of every forest, then retrains
+with compacting parameters (fewer trees, capped depth, cost-complexity
+pruning) and shows memory and accuracy side by side. A setting is accepted
+only if no column loses more than the tolerance of its current accuracy;
+the environment variables that apply it to the app are printed with it.
+--flat additionally reports the size of the array-backed FlatForest form.
+
+Run from the repository root:
+Usage: python AIModel/compact_models.py [--n-estimators N] [--max-depth D] [--ccp-alpha A] [--json]
+"""
+
+import argparse
+import json
+
+from app import MeasurementModels, ShirtPredictor, PantsPredictor, MAX_ACCURACY_DRIFT
+from flat_forest import FlatForest, model_memory
+
+ENVIRONMENT = {"n_estimators": "FOREST_N_ESTIMATORS", "max_depth": "FOREST_MAX_DEPTH", "ccp_alpha": "FOREST_CCP_ALPHA"}
+
+
+def print_report(report, flat):
+    before, after = report["memory_before"], report["memory_after"]
+    print(f"{'model':<18}{'trees':>8}{'nodes':>10}{'bytes':>12}{'compact bytes':>16}{'flat bytes':>12}")
+    for name in before:
+        if name == "total":
+            continue
+        flat_bytes = flat.get(name, "")
+        print(
+            f"{name:<18}{before[name]['trees']:>8}{before[name]['nodes']:>10}"
+            f"{before[name]['bytes']:>12}{after[name]['bytes']:>16}{flat_bytes:>12}"
+        )
+    print(f"{'total':<18}{before['total']['trees']:>8}{before['total']['nodes']:>10}"
+          f"{before['total']['bytes']:>12}{after['total']['bytes']:>16}{flat.get('total', ''):>12}")
+
+    print(f"\n{'column':<18}{'accuracy':>10}{'compact':>10}{'drop':>10}")
+    for col, drop in report["accuracy_drops"].items():
+        print(f"{col:<18}{report['accuracies_before'][col]:>10}{report['accuracies_after'][col]:>10}{drop:>10}")
+
+    if report["accepted"]:
+        settings = " ".join(
+            f"{ENVIRONMENT[key]}={value}" for key, value in report["params"].items() if key in ENVIRONMENT
+        )
+        print(f"\nAccepted. Apply with: {settings}")
+    else:
+        print("\nRejected: accuracy dropped more than the tolerance")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n-estimators", type=int, help="trees per forest")
+    parser.add_argument("--max-depth", type=int, help="maximum tree depth")
+    parser.add_argument("--ccp-alpha", type=float, help="cost-complexity pruning strength")
+    parser.add_argument("--tolerance", type=float, default=MAX_ACCURACY_DRIFT, help="largest accepted accuracy drop per column")
+    parser.add_argument("--flat", action="store_true", help="also report FlatForest sizes of the compacted models")
+    parser.add_argument("--json", action="store_true", help="print the raw report as JSON")
+    args = parser.parse_args()
+
+    params = {
+        key: value for key, value in [
+            ("n_estimators", args.n_estimators), ("max_depth", args.max_depth), ("ccp_alpha", args.ccp_alpha)
+        ] if value is not None
+    }
+    models = MeasurementModels.shared([ShirtPredictor(), PantsPredictor()])
+    models.train()
+    report = models.compact(args.tolerance, **params)
+
+    flat = {}
+    if args.flat:
+        flat = {name: model_memory(FlatForest.from_forest(model))["bytes"] for name, model in models.models.items()}
+        flat["total"] = sum(flat.values())
+        report["flat_bytes"] = flat
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, flat)
@@ -0,0 +1,72 @@
+"""
+Side-by-side comparison of the per-column and multi-output model layouts
+
+Trains both layouts for each garment and prints accuracy per column along
+with training time, serialized model size and single-request latency.
+
+Run from the repository root:
+Usage: python AIModel/compare_layouts.py [--requests N] [--json]
+"""
+
+import argparse
+import json
+import pickle
+import time
+
+import numpy as np
+
+from app import ShirtPredictor, PantsPredictor
+
+LAYOUTS = ["per_column", "multi_output"]
+
+
+def measure(predictor_cls, layout, requests):
+    predictor = predictor_cls(layout=layout)
+    
+    start = time.perf_counter()
+    predictor.train()
+    train_seconds = time.perf_counter() - start
+    
+    heights = np.random.RandomState(0).uniform(150, 200, requests)
+    start = time.perf_counter()
+    for height in heights:
+        predictor.predict(height)
+    latency_ms = (time.perf_counter() - start) / requests * 1000
+    
+    return {
+        "garment": predictor.name,
+        "layout": layout,
+        "train_seconds": round(train_seconds, 3),
+        "model_bytes": len(pickle.dumps(predictor.models)),
+        "predict_latency_ms": round(latency_ms, 3),
+        "accuracies": predictor.accuracies
+    }
+
+
+def print_table(results):
+    for garment in dict.fromkeys(r["garment"] for r in results):
+        rows = {r["layout"]: r for r in results if r["garment"] == garment}
+        print(f"\n{garment} ({' vs '.join(LAYOUTS)})")
+        for col in rows[LAYOUTS[0]]["accuracies"]:
+            cells = "  ".join(f"{rows[layout]['accuracies'][col]:>12}" for layout in LAYOUTS)
+            print(f"  {col:<18}{cells}")
+        for metric in ["train_seconds", "model_bytes", "predict_latency_ms"]:
+            cells = "  ".join(f"{rows[layout][metric]:>12}" for layout in LAYOUTS)
+            print(f"  {metric:<18}{cells}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="predict() calls used for latency")
+    parser.add_argument("--json", action="store_true", help="print raw results as JSON")
+    args = parser.parse_args()
+    
+    results = [
+        measure(predictor_cls, layout, args.requests)
+        for predictor_cls in [ShirtPredictor, PantsPredictor]
+        for layout in LAYOUTS
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
@@ -0,0 +1,79 @@
+"""
+Shared pytest setup: the modules import each other by name and read the
+training data and size charts relative to the repository root, the same
+way the app and the command line tools are run.
+
+Run from the repository root:
+Usage: python -m pytest AIModel
+"""
+
+import os
+import shutil
+import sys
+import threading
+
+import pytest
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(MODULE_DIR)
+
+if MODULE_DIR not in sys.path:
+    sys.path.insert(0, MODULE_DIR)
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    return REPO_ROOT
+
+
+def trained(predictor_cls, n_estimators=20, layout="per_column", **params):
+    """A predictor trained on the repository data with a small, fast forest"""
+    os.chdir(REPO_ROOT)
+    predictor = predictor_cls(layout=layout)
+    predictor.model_set.params = dict({"n_estimators": n_estimators, "random_state": 0}, **params)
+    predictor.model_set.train(workers=1)
+    return predictor
+
+
+@pytest.fixture(scope="session")
+def small_predictors():
+    """Shirt, pants and outfit predictors sharing one small trained model set"""
+    import app
+    os.chdir(REPO_ROOT)
+    shirt, pants = app.ShirtPredictor(), app.PantsPredictor()
+    models = app.MeasurementModels.shared([shirt, pants])
+    models.params = {"n_estimators": 20, "random_state": 0}
+    models.train(workers=1)
+    return shirt, pants, app.OutfitPredictor([shirt, pants])
+
+
+@pytest.fixture
+def initialized_app(small_predictors, tmp_path, monkeypatch):
+    """
+    The app module as initialize() leaves it, with the small models and
+    copies of the size charts, so no test trains or writes into the repository
+    """
+    import app
+    charts = {}
+    for name in [app.SHIRT_SIZE_CHARTS_PATH, app.PANTS_SIZE_CHARTS_PATH]:
+        charts[name] = str(tmp_path / os.path.basename(name))
+        shutil.copy(os.path.join(REPO_ROOT, name), charts[name])
+    ready = threading.Event()
+    ready.set()
+    shirt, pants, outfit = small_predictors
+    state = {
+        "shirt_predictor": shirt,
+        "pants_predictor": pants,
+        "outfit_predictor": outfit,
+        "brand_predictor": app.BrandSizePredictor(charts[app.SHIRT_SIZE_CHARTS_PATH]),
+        "pants_size_predictor": app.PantsSizePredictor(charts[app.PANTS_SIZE_CHARTS_PATH]),
+        "measurement_cache": app.ResultCache(),
+        "size_cache": app.ResultCache(),
+        "batchers": {},
+        "MICRO_BATCHING": False,
+        "_ready": ready
+    }
+    for name, value in state.items():
+        monkeypatch.setitem(vars(app), name, value)
+    return app
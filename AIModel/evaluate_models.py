@@ -0,0 +1,161 @@
+"""
+Cross-validated accuracy and latency sweep for the measurement models
+
+The accuracies the predictors report are scored on their own training rows,
+which says little about whether a cheaper model is good enough. This sweep
+scores every target on held-out rows instead: for each combination of
+forest family, tree count and maximum depth, k-fold cross-validation fits
+one forest per target and fold in parallel worker processes and records the
+held-out accuracy (classifiers) or R² (regressors), training time,
+single-row predict latency and serialized model size. A configuration meets
+the accuracy bar when no column scores more than the tolerance below the
+best configuration for that column (nor below --min-score); the fastest one
+that does is printed with the environment variables that apply it to the
+app. Latencies are only comparable with at most one worker per CPU.
+
+Run from the repository root:
+Usage: python AIModel/evaluate_models.py [--folds K] [--families F,...] [--n-estimators N,...] [--max-depths D,...] [--json]
+"""
+
+import argparse
+import itertools
+import json
+
+import numpy as np
+from sklearn.model_selection import KFold
+
+from app import MeasurementModels, ShirtPredictor, PantsPredictor, MAX_ACCURACY_DRIFT, MODEL_LAYOUT, TRAINING_WORKERS
+from training import FAMILIES, evaluate_fold, process_pool
+
+N_ESTIMATORS = [25, 50, 100]
+# None leaves the trees unbounded, as the app does by default
+MAX_DEPTHS = [None, 8, 12]
+ENVIRONMENT = {"family": "FOREST_FAMILY", "n_estimators": "FOREST_N_ESTIMATORS", "max_depth": "FOREST_MAX_DEPTH"}
+
+
+def parse_list(value, cast):
+    return [None if item.strip().lower() == "none" else cast(item.strip()) for item in value.split(",")]
+
+
+def configurations(families, n_estimators, max_depths):
+    return [
+        {"family": family, "n_estimators": trees, "max_depth": depth}
+        for family, trees, depth in itertools.product(families, n_estimators, max_depths)
+    ]
+
+
+def cross_validate(models, configs, folds=5, workers=1, seed=42, latency_rows=50):
+    """
+    Held-out scores and costs of every configuration, one entry per
+    configuration with per-column score means and deviations over the folds
+    and the training time, latency and size summed over all targets (one
+    request predicts every column)
+    """
+    # Scaling one feature does not change any tree split and the encoders
+    # must know every label, so both are fitted once on all rows
+    _, X, targets = models.training_data()
+    splits = list(KFold(folds, shuffle=True, random_state=seed).split(X))
+    jobs = {
+        (i, name, fold): (kind, X, y, train_index, test_index, dict(models.params, **config), latency_rows)
+        for i, config in enumerate(configs)
+        for name, (kind, _, y) in targets.items()
+        for fold, (train_index, test_index) in enumerate(splits)
+    }
+
+    if workers <= 1:
+        outcomes = {key: evaluate_fold(*job) for key, job in jobs.items()}
+    else:
+        with process_pool(workers) as pool:
+            futures = {key: pool.submit(evaluate_fold, *job) for key, job in jobs.items()}
+            outcomes = {key: future.result() for key, future in futures.items()}
+
+    results = []
+    for i, config in enumerate(configs):
+        result = {"params": config, "columns": {}, "fit_seconds": 0.0, "latency_ms": 0.0, "batch_us_per_row": 0.0, "bytes": 0}
+        for name, (kind, columns, _) in targets.items():
+            runs = [outcomes[(i, name, fold)] for fold in range(folds)]
+            for j, col in enumerate(columns):
+                scores = [run["scores"][j] for run in runs]
+                result["columns"][col] = {
+                    "metric": "accuracy" if kind == "classifier" else "r2",
+                    "mean": round(float(np.mean(scores)), 4),
+                    "std": round(float(np.std(scores)), 4)
+                }
+            for key in ["fit_seconds", "latency_ms", "batch_us_per_row", "bytes"]:
+                result[key] += float(np.mean([run[key] for run in runs]))
+        result["fit_seconds"] = round(result["fit_seconds"], 3)
+        result["latency_ms"] = round(result["latency_ms"], 3)
+        result["batch_us_per_row"] = round(result["batch_us_per_row"], 2)
+        result["bytes"] = int(result["bytes"])
+        results.append(result)
+    return results
+
+
+def select(results, tolerance=MAX_ACCURACY_DRIFT, min_score=None):
+    """
+    Mark which results meet the accuracy bar and return the fastest of them,
+    or None if none does
+    """
+    best = {col: max(result["columns"][col]["mean"] for result in results) for col in results[0]["columns"]}
+    for result in results:
+        shortfalls = {col: round(best[col] - score["mean"], 4) for col, score in result["columns"].items()}
+        result["largest_shortfall"] = max(shortfalls.values())
+        result["meets_bar"] = result["largest_shortfall"] <= tolerance and (
+            min_score is None or min(score["mean"] for score in result["columns"].values()) >= min_score
+        )
+    eligible = [result for result in results if result["meets_bar"]]
+    return min(eligible, key=lambda result: (result["latency_ms"], result["bytes"]), default=None)
+
+
+def print_report(results, chosen):
+    print(f"{'family':<15}{'trees':>7}{'depth':>7}{'worst score':>13}{'shortfall':>11}"
+          f"{'fit s':>9}{'latency ms':>12}{'batch us/row':>14}{'bytes':>12}  bar")
+    for result in results:
+        params = result["params"]
+        worst = min(score["mean"] for score in result["columns"].values())
+        print(
+            f"{params['family']:<15}{params['n_estimators']:>7}{str(params['max_depth']):>7}{worst:>13}"
+            f"{result['largest_shortfall']:>11}{result['fit_seconds']:>9}{result['latency_ms']:>12}"
+            f"{result['batch_us_per_row']:>14}{result['bytes']:>12}  {'yes' if result['meets_bar'] else 'no'}"
+        )
+
+    if chosen is None:
+        print("\nNo configuration meets the accuracy bar")
+        return
+    print(f"\n{'column':<18}{'metric':>9}{'held-out':>10}{'std':>8}")
+    for col, score in chosen["columns"].items():
+        print(f"{col:<18}{score['metric']:>9}{score['mean']:>10}{score['std']:>8}")
+    settings = " ".join(
+        f"{ENVIRONMENT[key]}={value}" for key, value in chosen["params"].items() if value is not None
+    )
+    print(f"\nFastest configuration meeting the bar: {chosen['params']}. Apply with: {settings}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--folds", type=int, default=5, help="cross-validation folds")
+    parser.add_argument("--families", default=",".join(FAMILIES), help="comma separated forest families")
+    parser.add_argument("--n-estimators", default=",".join(map(str, N_ESTIMATORS)), help="comma separated tree counts")
+    parser.add_argument("--max-depths", default=",".join(map(str, MAX_DEPTHS)), help="comma separated depths, none for unbounded")
+    parser.add_argument("--layout", default=MODEL_LAYOUT, choices=["per_column", "multi_output"], help="model layout to evaluate")
+    parser.add_argument("--tolerance", type=float, default=MAX_ACCURACY_DRIFT, help="largest accepted score drop below the best configuration")
+    parser.add_argument("--min-score", type=float, help="lowest accepted held-out score of any column")
+    parser.add_argument("--workers", type=int, default=TRAINING_WORKERS, help="parallel fitting processes")
+    parser.add_argument("--seed", type=int, default=42, help="fold shuffling seed")
+    parser.add_argument("--json", action="store_true", help="print the raw results as JSON")
+    args = parser.parse_args()
+
+    families = args.families.split(",")
+    unknown = [family for family in families if family not in FAMILIES]
+    if unknown:
+        parser.error(f"unknown families {unknown}, choose from {list(FAMILIES)}")
+    configs = configurations(families, parse_list(args.n_estimators, int), parse_list(args.max_depths, int))
+
+    models = MeasurementModels.shared([ShirtPredictor(), PantsPredictor()], args.layout)
+    results = cross_validate(models, configs, args.folds, args.workers, args.seed)
+    chosen = select(results, args.tolerance, args.min_score)
+
+    if args.json:
+        print(json.dumps({"results": results, "chosen": chosen}, indent=2))
+    else:
+        print_report(results, chosen)
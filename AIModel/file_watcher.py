@@ -0,0 +1,68 @@
+"""
+Polling file watcher for hot-reloading data files
+
+A daemon thread checks the size and modification time of every watched file
+at a fixed interval and calls its callback from that thread once a change
+has stayed the same for one full interval, so files that are still being
+written are not picked up half-way. Callback failures are logged and the
+file is retried on its next change.
+"""
+
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class FileWatcher:
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        # path -> [callback, signature last loaded, signature seen on the previous poll]
+        self._watches = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, path, callback):
+        signature = _signature(path)
+        self._watches[path] = [callback, signature, signature]
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="file-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def poll(self):
+        """Check every watched file once, calling back for settled changes"""
+        for path, watch in list(self._watches.items()):
+            callback, loaded, previous = watch
+            current = _signature(path)
+            watch[2] = current
+            if current is None or current == loaded or current != previous:
+                continue
+            watch[1] = current
+            logger.info("Reloading %s after it changed", path)
+            try:
+                callback()
+            except Exception as e:
+                logger.error("Reloading %s failed: %s", path, e)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
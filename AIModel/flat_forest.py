@@ -0,0 +1,144 @@
+"""
+Array-backed random forests for serving
+
+A fitted sklearn forest keeps every tree as a separate estimator object with
+per-node impurity and sample statistics that prediction never reads.
+FlatForest keeps only what predict() needs, concatenated over all trees into
+a handful of NumPy arrays, and reproduces the forest's predictions exactly.
+It pickles to a fraction of the size and can be saved as a plain .npz file.
+"""
+
+import pickle
+
+import numpy as np
+
+# Marks a leaf in the children arrays, as in sklearn's tree_.children_left
+LEAF = -1
+
+
+class FlatForest:
+    def __init__(self, kind, feature, threshold, left, right, value, roots, classes=None):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        # Per node: mean target values (regressor) or class probabilities (classifier)
+        self.value = value
+        # Offset of each tree's root node in the arrays
+        self.roots = roots
+        # Class labels per output, for classifiers
+        self.classes = classes
+
+    @classmethod
+    def from_forest(cls, model):
+        """Flatten a fitted random forest or extra-trees classifier or regressor"""
+        classifier = hasattr(model, "classes_")
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            roots.append(offset)
+            leaf = tree.children_left == LEAF
+            features.append(np.where(leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(leaf, LEAF, tree.children_left + offset))
+            rights.append(np.where(leaf, LEAF, tree.children_right + offset))
+            value = tree.value
+            if classifier:
+                # predict_proba normalizes leaf values per output the same way
+                normalizer = value.sum(axis=2, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            values.append(value)
+            offset += tree.node_count
+
+        classes = None
+        if classifier:
+            classes = model.classes_ if model.n_outputs_ > 1 else [model.classes_]
+        return cls(
+            "classifier" if classifier else "regressor",
+            np.concatenate(features).astype(np.int32),
+            np.concatenate(thresholds),
+            np.concatenate(lefts).astype(np.int32),
+            np.concatenate(rights).astype(np.int32),
+            np.concatenate(values),
+            np.array(roots, dtype=np.int32),
+            classes
+        )
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def _leaves(self, X):
+        """Leaf node reached in every tree, shape (trees, samples)"""
+        # Trees compare the float32-cast feature against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        samples = np.arange(len(X))
+        nodes = np.repeat(self.roots[:, None], len(X), axis=1)
+        active = self.left[nodes] != LEAF
+        while active.any():
+            current = nodes[active]
+            go_left = X[np.broadcast_to(samples, nodes.shape)[active], self.feature[current]] <= self.threshold[current]
+            nodes[active] = np.where(go_left, self.left[current], self.right[current])
+            active = self.left[nodes] != LEAF
+        return nodes
+
+    def predict(self, X):
+        leaves = self._leaves(X)
+        # Accumulate tree by tree, in the same order and precision as sklearn
+        total = np.zeros((leaves.shape[1],) + self.value.shape[1:])
+        for tree_leaves in leaves:
+            total += self.value[tree_leaves]
+        total /= len(leaves)
+
+        if self.kind == "regressor":
+            total = total[:, :, 0]
+            return total[:, 0] if total.shape[1] == 1 else total
+        predictions = np.stack(
+            [classes[np.argmax(total[:, k, :len(classes)], axis=1)] for k, classes in enumerate(self.classes)],
+            axis=1
+        )
+        return predictions[:, 0] if len(self.classes) == 1 else predictions
+
+    def split_thresholds(self):
+        """Thresholds of every internal node, as used by the height lookup table"""
+        return self.threshold[self.left != LEAF]
+
+    def save(self, path):
+        arrays = dict(
+            feature=self.feature, threshold=self.threshold, left=self.left, right=self.right,
+            value=self.value, roots=self.roots, kind=np.array(self.kind)
+        )
+        if self.classes is not None:
+            for k, classes in enumerate(self.classes):
+                arrays[f"classes_{k}"] = np.asarray(classes)
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        classes = None
+        if "classes_0" in data:
+            classes = [data[f"classes_{k}"] for k in range(sum(name.startswith("classes_") for name in data))]
+        return cls(
+            str(data["kind"]), data["feature"], data["threshold"], data["left"],
+            data["right"], data["value"], data["roots"], classes
+        )
+
+
+def model_memory(model):
+    """Tree count, node count, depth and serialized size of a fitted forest"""
+    if isinstance(model, FlatForest):
+        nodes = len(model.left)
+        depth = None
+    else:
+        nodes = sum(estimator.tree_.node_count for estimator in model.estimators_)
+        depth = max(estimator.tree_.max_depth for estimator in model.estimators_)
+    return {
+        "trees": model.n_estimators,
+        "nodes": int(nodes),
+        "max_depth": depth,
+        "bytes": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+    }
@@ -0,0 +1,84 @@
+"""
+Compiled height lookup table for the measurement predictors
+
+Every model takes TotalHeight as its only feature, so each forest is a
+piecewise-constant function of height whose breakpoints are the split
+thresholds of its trees. Evaluating the forests once per interval between
+consecutive thresholds gives a table that reproduces their predictions
+exactly and answers a request with a single binary search.
+"""
+
+import bisect
+
+import numpy as np
+
+
+def _split_thresholds(model):
+    if hasattr(model, "split_thresholds"):
+        # Flattened forests keep all trees' nodes in shared arrays
+        return model.split_thresholds()
+    thresholds = []
+    for tree in model.estimators_:
+        # Leaf nodes carry feature == -2 and a placeholder threshold
+        internal = tree.tree_.feature >= 0
+        thresholds.append(tree.tree_.threshold[internal])
+    return np.concatenate(thresholds) if thresholds else np.empty(0)
+
+
+def _representatives(thresholds):
+    """One float32 feature value inside each interval (-inf, t0], (t0, t1], ..., (tn, inf)"""
+    # Trees compare the float32-cast feature against float64 thresholds, so the
+    # representatives must be float32 values that fall on the same side of every split
+    points = []
+    for t in thresholds:
+        r = np.float32(t)
+        if r > t:
+            r = np.nextafter(r, np.float32(-np.inf))
+        points.append(r)
+    if len(thresholds):
+        r = np.float32(thresholds[-1])
+        while r <= thresholds[-1]:
+            r = np.nextafter(r, np.float32(np.inf))
+        points.append(r)
+    else:
+        points.append(np.float32(0.0))
+    return np.array(points, dtype=np.float32).reshape(-1, 1)
+
+
+class HeightLookupTable:
+    def __init__(self, mean, scale, thresholds, rows):
+        self.mean = mean
+        self.scale = scale
+        self.thresholds = thresholds
+        self.rows = rows
+        # Column-wise copy of the rows for vectorized lookups
+        self.columns = {
+            col: np.array([row[col] for row in rows]) for col in (rows[0] if rows else {})
+        }
+        self.threshold_array = np.array(thresholds, dtype=np.float64)
+
+    @classmethod
+    def compile(cls, scaler, forests, predict_rows):
+        """Build the table from fitted forests and a function mapping scaled heights to rows"""
+        thresholds = np.unique(np.concatenate(
+            [_split_thresholds(forest) for forest in forests]
+        ))
+        rows = predict_rows(_representatives(thresholds))
+        return cls(
+            float(scaler.mean_[0]),
+            float(scaler.scale_[0]),
+            thresholds.tolist(),
+            rows
+        )
+
+    def lookup(self, height):
+        """Predicted values for one height, keyed by column"""
+        # Same arithmetic as StandardScaler.transform followed by the trees' float32 cast
+        scaled = float(np.float32((float(height) - self.mean) / self.scale))
+        return self.rows[bisect.bisect_left(self.thresholds, scaled)]
+
+    def lookup_many(self, heights):
+        """Predicted values for an array of heights, one array per column"""
+        scaled = ((np.asarray(heights, dtype=np.float64) - self.mean) / self.scale).astype(np.float32)
+        index = np.searchsorted(self.threshold_array, scaled.astype(np.float64), side='left')
+        return {col: values[index] for col, values in self.columns.items()}
@@ -0,0 +1,107 @@
+"""
+Non-blocking logging for the predictor services
+
+Records are put on an in-memory queue by the request threads and formatted
+and written to stderr by a single background listener thread, so neither
+message formatting nor log I/O runs on the request path. Messages should use
+logging's lazy %-style arguments; records are queued without being
+formatted, so the arguments must not be mutated after the call.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+# Listener started by configure_logging and whether its thread is running
+_listener = None
+_listening = False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any `extra` fields as top-level keys"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread and drops
+    records instead of blocking when the queue is full
+    """
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure_logging(level=logging.INFO, fmt="text", queue_size=10000):
+    """
+    Route the root logger through a bounded queue to a background stderr
+    writer; returns the listener. When the queue is full new records are
+    dropped rather than blocking the caller. Like logging.basicConfig, does
+    nothing if the root logger already has handlers.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    records = queue.Queue(queue_size)
+    listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    root.addHandler(DeferredQueueHandler(records))
+    root.setLevel(level)
+
+    global _listener
+    _listener = listener
+    resume_logging()
+    atexit.register(pause_logging)
+    return listener
+
+
+def pause_logging():
+    """
+    Write out the queued records and stop the listener thread. Call before
+    os.fork() so that no child inherits a queue lock held by that thread.
+    """
+    global _listening
+    if _listening:
+        _listener.stop()
+        _listening = False
+
+
+def resume_logging():
+    """Start the listener thread again, in the parent and in a forked child"""
+    global _listening
+    if _listener is not None and not _listening:
+        _listener.start()
+        _listening = True
@@ -0,0 +1,135 @@
+"""
+Micro-batching of concurrent predictor calls
+
+Requests submitted from any thread (or awaited from any event loop) are
+collected on the batcher's own asyncio loop and answered by one call of the
+batch function, so concurrent callers share a single model invocation
+instead of each paying the per-call overhead. Only one batch runs at a time;
+requests arriving meanwhile form the next batch, so batches grow with the
+load. An idle batcher starts a batch as soon as the loop has taken in the
+requests already submitted, or after `window` seconds if one is set, so a
+lone request pays no waiting time by default. If a batch
+fails, its requests are retried one by one so every caller gets its own
+result or exception.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    def __init__(self, process_batch, window=0, max_batch_size=64, name="batcher"):
+        # process_batch(items) returns one result per item, in order
+        self.process_batch = process_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self._loop = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+        self._running = False
+        self._executor = None
+
+    def _ensure_started(self):
+        # Started on first use, and again in a forked child, which inherits no threads
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._pending, self._timer, self._running = [], None, False
+            self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix=f"{self.name}-inference")
+            threading.Thread(target=self._loop.run_forever, name=self.name, daemon=True).start()
+            self._pid = os.getpid()
+
+    def submit_future(self, item):
+        """Queue an item; returns a concurrent.futures.Future of its result"""
+        self._ensure_started()
+        future = concurrent.futures.Future()
+        self._loop.call_soon_threadsafe(self._add, item, future)
+        return future
+
+    def submit(self, item):
+        """Result for one item, blocking the calling thread until its batch has run"""
+        return self.submit_future(item).result()
+
+    async def submit_async(self, item):
+        """Result for one item, awaitable from any event loop"""
+        return await asyncio.wrap_future(self.submit_future(item))
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0
+        }
+
+    # The methods below run on the batcher's event loop
+
+    def _add(self, item, future):
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None and not self._running:
+            # Requests submitted together are already queued on the loop and join this batch
+            if self.window > 0:
+                self._timer = self._loop.call_later(self.window, self._flush)
+            else:
+                self._timer = self._loop.call_soon(self._flush)
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._running or not self._pending:
+            return
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        self._running = True
+        self._loop.run_in_executor(self._executor, self._run, batch).add_done_callback(self._done)
+
+    def _done(self, _):
+        self._running = False
+        # Whatever arrived during the last batch has already waited long enough
+        if self._pending:
+            self._flush()
+
+    # Runs on the inference thread
+
+    def _run(self, batch):
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = self.process_batch([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                _resolve(batch[0][1], exception=e)
+                return
+            logger.warning("Batch of %s failed in %s, retrying one by one: %s", len(batch), self.name, e)
+            for item, future in batch:
+                try:
+                    _resolve(future, self.process_batch([item])[0])
+                except Exception as item_error:
+                    _resolve(future, exception=item_error)
+            return
+        for (_, future), result in zip(batch, results):
+            _resolve(future, result)
+
+
+def _resolve(future, result=None, exception=None):
+    # Callers may have given up on (cancelled) their future meanwhile
+    if future.set_running_or_notify_cancel():
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
@@ -0,0 +1,143 @@
+"""
+Model artifact store for the measurement predictors
+
+Fitted models are serialized with joblib under a key derived from the
+training data and hyperparameters, so a worker only retrains when either
+of them changes.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(data_path, params):
+    """Content hash of the training data, hyperparameters and sklearn version"""
+    import sklearn
+
+    digest = hashlib.sha256()
+    if os.path.isdir(data_path):
+        # Partitioned data: every file in a stable order, names included
+        paths = sorted(
+            os.path.join(root, name)
+            for root, _, names in os.walk(data_path) for name in names
+        )
+    else:
+        paths = [data_path]
+    for path in paths:
+        if path != data_path:
+            digest.update(os.path.relpath(path, data_path).encode())
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    # Pickled estimators are only safe to load with the version that wrote them
+    digest.update(sklearn.__version__.encode())
+    return digest.hexdigest()[:16]
+
+
+def _data_files(data_path):
+    if not os.path.isdir(data_path):
+        return {os.path.basename(data_path): data_path}
+    return {
+        os.path.relpath(os.path.join(root, name), data_path): os.path.join(root, name)
+        for root, _, names in os.walk(data_path) for name in names
+    }
+
+
+def _file_digest(path, size=None):
+    """sha256 of a file, or of its first `size` bytes"""
+    digest = hashlib.sha256()
+    remaining = os.path.getsize(path) if size is None else size
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(1 << 20, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+
+def data_checkpoint(data_path):
+    """Size and hash of every training data file, to recognize appended rows later"""
+    return {
+        name: {"size": os.path.getsize(path), "sha256": _file_digest(path)}
+        for name, path in _data_files(data_path).items()
+    }
+
+
+def appended_since(data_path, checkpoint):
+    """
+    True when the data only grew since the checkpoint: every checkpointed
+    file still starts with the same bytes, and any other file is new
+    """
+    files = _data_files(data_path)
+    for name, entry in checkpoint.items():
+        path = files.get(name)
+        if path is None or os.path.getsize(path) < entry["size"]:
+            return False
+        if _file_digest(path, entry["size"]) != entry["sha256"]:
+            return False
+    return True
+
+
+class ModelStore:
+    def __init__(self, root):
+        self.root = root
+
+    def path_for(self, name, key):
+        return os.path.join(self.root, f"{name}-{key}.joblib")
+
+    def load(self, name, key):
+        path = self.path_for(name, key)
+        if not os.path.exists(path):
+            return None
+        import joblib
+
+        try:
+            return joblib.load(path)
+        except Exception as e:
+            logger.warning("Discarding unreadable model artifact %s: %s", path, e)
+            return None
+
+    def load_latest(self, name):
+        """Most recently saved artifact of this name whatever its key, or None"""
+        paths = glob.glob(os.path.join(self.root, f"{name}-*.joblib"))
+        if not paths:
+            return None
+        path = max(paths, key=os.path.getmtime)
+        key = os.path.basename(path)[len(name) + 1:-len(".joblib")]
+        return self.load(name, key)
+
+    def save(self, name, key, artifact):
+        import joblib
+
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f".{name}-", suffix=".tmp")
+        os.close(fd)
+        try:
+            joblib.dump(artifact, tmp_path)
+            # Atomic rename so concurrently starting workers never read a partial file
+            os.replace(tmp_path, self.path_for(name, key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info("Saved %s model artifact %s", name, key)
+        self._prune(name, key)
+
+    def _prune(self, name, key):
+        """Remove artifacts of the same name left behind by older data or parameters"""
+        current = self.path_for(name, key)
+        for path in glob.glob(os.path.join(self.root, f"{name}-*.joblib")):
+            if path != current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
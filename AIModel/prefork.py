@@ -0,0 +1,138 @@
+"""
+Pre-fork HTTP serving with models shared between worker processes
+
+The parent process loads the models once, freezes the garbage collector so
+later collections do not write to the loaded objects, and forks the worker
+processes, which all accept connections on one inherited listening socket.
+Workers get the models copy-on-write: model arrays are only read after
+loading, so their pages stay shared with the parent and each extra worker
+adds its own interpreter and request state but no copy of the models. The
+parent only supervises, replacing workers that exit and forwarding SIGTERM
+and SIGINT for a graceful shutdown. Requires os.fork (Linux, macOS).
+"""
+
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+from logging_setup import pause_logging, resume_logging
+
+logger = logging.getLogger(__name__)
+
+# Workers that exit sooner than this after starting are restarted with a delay
+MIN_WORKER_LIFETIME = 1.0
+
+
+def memory_usage(pid="self"):
+    """Resident, proportional (PSS), shared and private memory of a process in bytes (Linux only)"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    }
+
+
+def fork(child):
+    """
+    Fork a process that runs child() and exits; returns its pid. The logging
+    listener is paused around the fork so the child starts with unlocked
+    logging state and its own listener thread.
+    """
+    pause_logging()
+    pid = os.fork()
+    if pid != 0:
+        resume_logging()
+        return pid
+
+    code = 0
+    resume_logging()
+    try:
+        child()
+    except BaseException:
+        logger.exception("Worker process failed")
+        code = 1
+    finally:
+        pause_logging()
+        os._exit(code)
+
+
+class PreforkServer:
+    def __init__(self, app_factory, host, port, workers, prepare=None, worker_init=None):
+        self.app_factory = app_factory
+        self.host = host
+        self.port = port
+        self.workers = workers
+        # prepare runs once in the parent before the first fork, worker_init in every worker after it
+        self.prepare = prepare
+        self.worker_init = worker_init
+        self.processes = {}
+        self.stopping = False
+        self.sock = None
+
+    def listen(self):
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _serve(self):
+        import uvicorn
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        if self.worker_init is not None:
+            self.worker_init()
+        config = uvicorn.Config(self.app_factory, factory=True, host=self.host, port=self.port)
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+    def _spawn(self):
+        pid = fork(self._serve)
+        self.processes[pid] = time.monotonic()
+        return pid
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.processes):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        self.sock = self.listen()
+        if self.prepare is not None:
+            self.prepare()
+        # Keep the collector from touching (and so un-sharing) everything loaded so far
+        gc.collect()
+        gc.freeze()
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.workers):
+            self._spawn()
+        logger.info("Serving on %s:%s with %s workers %s", self.host, self.port, self.workers, sorted(self.processes))
+
+        while self.processes:
+            pid, status = os.wait()
+            started = self.processes.pop(pid, None)
+            if started is None or self.stopping:
+                continue
+            logger.warning("Worker %s exited with code %s, restarting", pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+            self._spawn()
+        self.sock.close()
+        logger.info("All workers stopped")
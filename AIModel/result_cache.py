@@ -0,0 +1,92 @@
+"""
+Bounded result cache for the predictor endpoints
+
+Entries are evicted least-recently-used once the cache is full and, when a
+TTL is set, expire that many seconds after being stored. Cached results are
+shared between callers and must be treated as read-only.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+def quantize(value, step, optional=False):
+    """
+    Cache key for a numeric input. A value on the step grid, give or take
+    float noise such as a slider's 70.10000000000001, is snapped to it so
+    equivalent requests share an entry; any other value is kept exactly, as
+    the result computed for it differs. A missing optional input stays None.
+    """
+    if value is None and optional:
+        return None
+    value = float(value)
+    # Half up, unlike round(), so that x.5 steps all go the same way
+    snapped = math.floor(value / step + 0.5) * step
+    if abs(value - snapped) <= 1e-9 * max(1.0, abs(value)):
+        return round(snapped, 9)
+    return value
+
+
+class ResultCache:
+    def __init__(self, maxsize=4096, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # Bumped by clear() so results computed before it are not stored after it
+        self._generation = 0
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, calling compute() on a miss; exceptions are not cached"""
+        if self.maxsize <= 0:
+            return compute()
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            generation = self._generation
+
+        value = compute()
+
+        with self._lock:
+            if generation != self._generation:
+                return value
+            expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
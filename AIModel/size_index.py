@@ -0,0 +1,394 @@
+"""
+Spatial index over brand size charts
+
+Every size in a chart is a box of [min, max] ranges over a few body
+measurements. The boxes are compiled at load time into a uniform grid in
+which each non-empty cell lists the sizes overlapping it, so a lookup only
+checks the sizes registered in the query's cell instead of every size of
+every brand. The ranges are kept as contiguous (sizes x dimensions) arrays
+so many points can also be matched against every size in one vectorized
+step. Nearest-size searches use a second layout that packs the
+boxes into spatially compact blocks and visits them closest first.
+
+A built index can be saved as a compiled binary file holding every array
+it needs, which is memory-mapped on load instead of parsing and rebuilding
+the JSON charts.
+"""
+
+import itertools
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+# Upper bound on grid resolution so very wide or very uneven charts stay small
+MAX_CELLS_PER_DIMENSION = 128
+# Smallest block of sizes nearest() examines at once
+MIN_BLOCK_SIZE = 16
+# Upper bound on point x size x dimension comparisons held in memory by match_pairs()
+MATCH_CHUNK_CELLS = 1 << 22
+
+# Per-dimension fit codes returned by bulk matching
+FIT_OUTSIDE = 0
+FIT_TOLERANCE = 1
+FIT_PERFECT = 2
+
+# Compiled index files: magic, format version, header length, JSON header, aligned arrays
+COMPILED_SUFFIX = ".szi"
+COMPILED_MAGIC = b"SZIX"
+COMPILED_VERSION = 1
+COMPILED_ALIGNMENT = 64
+_COMPILED_PREAMBLE = struct.Struct("<4sIQ")
+_COMPILED_ARRAYS = [
+    "raw", "raw_is_int", "lower", "upper", "brand_ids", "labels", "brand_names",
+    "origin", "cell_size", "shape", "cell_ids", "cell_start", "cell_members",
+    "block_members", "block_start", "block_lower", "block_upper"
+]
+
+
+class SizeChartIndex:
+    def __init__(self, brand_charts, dimensions, tolerance=0):
+        self.dimensions = list(dimensions)
+        self.tolerance = tolerance
+        self.brands = [brand["brand"] for brand in brand_charts]
+        # (brand position, size entry) for every size, in chart order
+        self.sizes = [
+            (b, size)
+            for b, brand in enumerate(brand_charts)
+            for size in brand["sizes"]
+        ]
+
+        self._charts = brand_charts
+
+        shape = (len(self.sizes), len(self.dimensions), 2)
+        self.raw = np.array(
+            [[size[dim] for dim in self.dimensions] for _, size in self.sizes],
+            dtype=float
+        ).reshape(shape)
+        # Which chart values were integers, so compiled indexes rebuild them exactly
+        self.raw_is_int = np.array(
+            [[[isinstance(value, int) for value in size[dim]] for dim in self.dimensions] for _, size in self.sizes],
+            dtype=bool
+        ).reshape(shape)
+        self.lower = self.raw[:, :, 0] - tolerance
+        self.upper = self.raw[:, :, 1] + tolerance
+        self.brand_ids = np.array([b for b, _ in self.sizes], dtype=np.int64)
+        self.labels = np.array([size["label"] for _, size in self.sizes], dtype=object)
+        self._build_grid()
+        self._build_blocks()
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def charts(self):
+        """The brand charts in their JSON structure"""
+        if self._charts is not None:
+            return self._charts
+        charts = [{"brand": str(brand), "sizes": []} for brand in self.brands]
+        for brand_position, size in self.sizes:
+            charts[brand_position]["sizes"].append(size)
+        return charts
+
+    def save(self, path, source=None):
+        """
+        Write the index as a compiled file that load() memory-maps. source is
+        stored in the header to tell whether the file is still current.
+        """
+        arrays = {name: getattr(self, name) for name in _COMPILED_ARRAYS if name not in ("labels", "brand_names")}
+        arrays["labels"] = np.array([str(label) for label in self.labels], dtype=str).reshape(-1)
+        arrays["brand_names"] = np.array([str(brand) for brand in self.brands], dtype=str).reshape(-1)
+
+        layout, offset = {}, 0
+        for name, array in arrays.items():
+            arrays[name] = array = np.ascontiguousarray(array)
+            offset = -(-offset // COMPILED_ALIGNMENT) * COMPILED_ALIGNMENT
+            layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += array.nbytes
+        header = json.dumps({
+            "dimensions": self.dimensions,
+            "tolerance": self.tolerance,
+            "source": source,
+            "arrays": layout
+        }).encode()
+        data_start = -(-(_COMPILED_PREAMBLE.size + len(header)) // COMPILED_ALIGNMENT) * COMPILED_ALIGNMENT
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=COMPILED_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_COMPILED_PREAMBLE.pack(COMPILED_MAGIC, COMPILED_VERSION, len(header)))
+                f.write(header)
+                for name, array in arrays.items():
+                    f.seek(data_start + layout[name]["offset"])
+                    f.write(array.tobytes())
+                f.truncate(data_start + offset)
+            # Atomic rename: readers map either the old file or the complete new one
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def read_header(path):
+        """Header of a compiled index file, or None if it is not a current-format index"""
+        with open(path, "rb") as f:
+            preamble = f.read(_COMPILED_PREAMBLE.size)
+            if len(preamble) < _COMPILED_PREAMBLE.size:
+                return None
+            magic, version, length = _COMPILED_PREAMBLE.unpack(preamble)
+            if magic != COMPILED_MAGIC or version != COMPILED_VERSION:
+                return None
+            return json.loads(f.read(length))
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a compiled index file written by save()"""
+        header = cls.read_header(path)
+        if header is None:
+            raise ValueError(f"{path} is not a compiled size chart index")
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        _, _, length = _COMPILED_PREAMBLE.unpack(buffer[:_COMPILED_PREAMBLE.size])
+        data_start = -(-(_COMPILED_PREAMBLE.size + length) // COMPILED_ALIGNMENT) * COMPILED_ALIGNMENT
+
+        index = cls.__new__(cls)
+        index.dimensions = header["dimensions"]
+        index.tolerance = header["tolerance"]
+        index._charts = None
+        index._buffer = buffer
+        for name, spec in header["arrays"].items():
+            setattr(index, name, np.ndarray(
+                tuple(spec["shape"]), dtype=np.dtype(spec["dtype"]),
+                buffer=buffer, offset=data_start + spec["offset"]
+            ))
+        index.brands = index.brand_names
+        index.sizes = _CompiledSizes(index)
+        return index
+
+    def _build_grid(self):
+        ndim = len(self.dimensions)
+        if not self.sizes:
+            self.origin = np.zeros(ndim)
+            self.cell_size = np.ones(ndim)
+            self.shape = np.ones(ndim, dtype=int)
+            self.cell_ids = np.empty(0, dtype=np.int64)
+            self.cell_start = np.zeros(1, dtype=np.int64)
+            self.cell_members = np.empty(0, dtype=np.int64)
+            return
+
+        self.origin = self.lower.min(axis=0)
+        span = self.upper.max(axis=0) - self.origin
+        # Cells about as wide as a typical size keep each box in a handful of cells
+        cell_size = np.maximum(
+            np.median(self.upper - self.lower, axis=0),
+            span / MAX_CELLS_PER_DIMENSION
+        )
+        cell_size[cell_size <= 0] = 1.0
+        self.cell_size = cell_size
+        self.shape = np.floor(span / cell_size).astype(int) + 1
+
+        first = self._cell_coords(self.lower)
+        last = self._cell_coords(self.upper)
+        cells, members = [], []
+        for position in range(len(self.sizes)):
+            ranges = [range(first[position, d], last[position, d] + 1) for d in range(ndim)]
+            for coords in itertools.product(*ranges):
+                cells.append(np.ravel_multi_index(coords, self.shape))
+                members.append(position)
+
+        # CSR layout: members grouped by cell, chart order preserved within each cell
+        cells = np.array(cells, dtype=np.int64)
+        members = np.array(members, dtype=np.int64)
+        order = np.lexsort((members, cells))
+        cells, members = cells[order], members[order]
+        self.cell_ids, starts = np.unique(cells, return_index=True)
+        self.cell_start = np.append(starts, len(cells)).astype(np.int64)
+        self.cell_members = members
+
+    def _cell_coords(self, points):
+        return np.floor((points - self.origin) / self.cell_size).astype(int)
+
+    def candidates(self, point):
+        """Positions of the sizes registered in the grid cell containing the point"""
+        point = np.asarray(point, dtype=float)
+        if not np.all(np.isfinite(point)):
+            return self.cell_members[:0]
+        coords = self._cell_coords(point)
+        if np.any(coords < 0) or np.any(coords >= self.shape):
+            return self.cell_members[:0]
+        cell = np.ravel_multi_index(tuple(coords), self.shape)
+        i = np.searchsorted(self.cell_ids, cell)
+        if i == len(self.cell_ids) or self.cell_ids[i] != cell:
+            return self.cell_members[:0]
+        return self.cell_members[self.cell_start[i]:self.cell_start[i + 1]]
+
+    def query(self, point):
+        """Positions, in chart order, of the sizes whose ranges contain the point"""
+        point = np.asarray(point, dtype=float)
+        candidates = self.candidates(point)
+        inside = np.all(
+            (self.lower[candidates] <= point) & (point <= self.upper[candidates]),
+            axis=1
+        )
+        return candidates[inside]
+
+    def match_many(self, points):
+        """
+        Match N points against every size at once. Returns an (N, sizes) match
+        mask and (N, sizes, dimensions) fit codes: FIT_PERFECT inside the
+        chart range, FIT_TOLERANCE inside the tolerance band only, else FIT_OUTSIDE.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 1, len(self.dimensions))
+        within = (self.lower <= points) & (points <= self.upper)
+        perfect = (self.lower + self.tolerance <= points) & (points <= self.upper - self.tolerance)
+        codes = np.where(perfect, FIT_PERFECT, np.where(within, FIT_TOLERANCE, FIT_OUTSIDE))
+        return within.all(axis=2), codes.astype(np.int8)
+
+    def match_pairs(self, points):
+        """
+        Sparse form of match_many() for large batches, processed in bounded chunks:
+        (point rows, size positions, fit codes) of every matching pair, ordered
+        by point and then chart order.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, len(self.dimensions))
+        chunk = max(1, MATCH_CHUNK_CELLS // max(1, len(self.sizes) * len(self.dimensions)))
+        rows, positions, codes = [], [], []
+        for start in range(0, len(points), chunk):
+            mask, fit = self.match_many(points[start:start + chunk])
+            r, c = np.nonzero(mask)
+            rows.append(r + start)
+            positions.append(c)
+            codes.append(fit[r, c])
+        if not rows:
+            return (
+                np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                np.empty((0, len(self.dimensions)), dtype=np.int8)
+            )
+        return np.concatenate(rows), np.concatenate(positions), np.concatenate(codes)
+
+    def offsets(self, point, positions):
+        """Signed distance from each size's ranges to the point, per dimension"""
+        point = np.asarray(point, dtype=float)
+        # Nearest-size distances use the chart ranges themselves, without the match tolerance
+        lower = self.lower[positions] + self.tolerance
+        upper = self.upper[positions] - self.tolerance
+        return point - np.clip(point, lower, upper)
+
+    def distances(self, point, positions, weights):
+        return np.sqrt(((self.offsets(point, positions) * weights) ** 2).sum(axis=1))
+
+    def nearest(self, point, k=3, weights=None):
+        """
+        Positions and distances of the k sizes closest to the point, closest
+        first. Distance is the weighted Euclidean distance from the point to a
+        size's ranges, so it is zero for every size the point falls inside.
+        Sizes at exactly the same distance may be returned in either order.
+        """
+        point = np.asarray(point, dtype=float)
+        weights = np.ones(len(self.dimensions)) if weights is None else np.asarray(weights, dtype=float)
+        if k <= 0 or not self.sizes or not np.all(np.isfinite(point)):
+            return self.block_members[:0], np.empty(0)
+
+        # Visit blocks by the distance to their bounding box and stop once no
+        # remaining block can hold a size closer than the current k-th best
+        block_bounds = np.sqrt(((
+            (point - np.clip(point, self.block_lower, self.block_upper)) * weights
+        ) ** 2).sum(axis=1))
+        positions = self.block_members[:0]
+        distances = np.empty(0)
+        for block in np.argsort(block_bounds, kind='stable'):
+            if len(positions) >= k and block_bounds[block] >= distances[k - 1]:
+                break
+            members = self.block_members[self.block_start[block]:self.block_start[block + 1]]
+            positions = np.concatenate([positions, members])
+            distances = np.concatenate([distances, self.distances(point, members, weights)])
+            order = np.lexsort((positions, distances))[:k]
+            positions, distances = positions[order], distances[order]
+        return positions, distances
+
+    def _build_blocks(self):
+        """Pack the sizes into spatially compact blocks (sort-tile-recursive) for nearest()"""
+        lower = self.lower + self.tolerance
+        upper = self.upper - self.tolerance
+        n = len(self.sizes)
+        block_size = max(MIN_BLOCK_SIZE, int(np.sqrt(n)))
+        centers = (lower + upper) / 2
+
+        def tile(members, dim):
+            members = members[np.argsort(centers[members, dim], kind='stable')]
+            if dim == len(self.dimensions) - 1 or len(members) <= block_size:
+                return [members]
+            blocks = -(-len(members) // block_size)
+            slabs = int(np.ceil(blocks ** (1 / (len(self.dimensions) - dim))))
+            slab_size = -(-blocks // slabs) * block_size
+            return [
+                part
+                for start in range(0, len(members), slab_size)
+                for part in tile(members[start:start + slab_size], dim + 1)
+            ]
+
+        members = np.concatenate(tile(np.arange(n), 0)) if n else np.empty(0, dtype=np.int64)
+        self.block_members = members.astype(np.int64)
+        self.block_start = np.append(np.arange(0, n, block_size), n).astype(np.int64)
+        self.block_lower = np.array([
+            lower[members[a:b]].min(axis=0)
+            for a, b in zip(self.block_start[:-1], self.block_start[1:])
+        ]).reshape(-1, len(self.dimensions))
+        self.block_upper = np.array([
+            upper[members[a:b]].max(axis=0)
+            for a, b in zip(self.block_start[:-1], self.block_start[1:])
+        ]).reshape(-1, len(self.dimensions))
+
+
+class _CompiledSizes:
+    """(brand position, size entry) pairs of a loaded index, rebuilt from its arrays on access"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return len(self.index.brand_ids)
+
+    def __getitem__(self, position):
+        index = self.index
+        size = {"label": str(index.labels[position])}
+        for d, dim in enumerate(index.dimensions):
+            size[dim] = [
+                int(value) if is_int else float(value)
+                for value, is_int in zip(index.raw[position, d], index.raw_is_int[position, d])
+            ]
+        return int(index.brand_ids[position]), size
+
+
+def load_size_index(path, dimensions, tolerance=0, compile=True):
+    """
+    Index for a size chart file. A compiled index file is memory-mapped
+    directly. For JSON charts, the compiled copy next to them is used when it
+    matches the JSON file's size and modification time; otherwise the JSON
+    is parsed and, with compile set, a fresh compiled copy is written.
+    """
+    if path.endswith(COMPILED_SUFFIX):
+        return SizeChartIndex.load(path)
+
+    stat = os.stat(path)
+    source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    compiled_path = path + COMPILED_SUFFIX
+    if os.path.exists(compiled_path):
+        header = SizeChartIndex.read_header(compiled_path)
+        if (header is not None and header["source"] == source
+                and header["dimensions"] == list(dimensions) and header["tolerance"] == tolerance):
+            return SizeChartIndex.load(compiled_path)
+
+    with open(path, "r") as f:
+        index = SizeChartIndex(json.load(f), dimensions, tolerance)
+    if compile:
+        try:
+            index.save(compiled_path, source)
+        except OSError:
+            # Read-only deployments keep working from the JSON
+            pass
+    return index
@@ -0,0 +1,169 @@
+"""
+Cache-friendly delivery of the built 3D assets
+
+Serves the outputs of asset_pipeline.py under content-hashed URLs: every
+response carries a strong ETag and a one-year immutable Cache-Control, and
+the precompressed brotli or gzip variant is sent when the client accepts
+it. A stable URL per asset (/garment-assets/jacket.glb) redirects to the
+hashed file of the requested level of detail, choosing the lightest level
+for clients that ask to save data or report a mobile device.
+"""
+
+import json
+import logging
+import os
+from urllib.parse import unquote
+
+logger = logging.getLogger(__name__)
+
+URL_PREFIX = "/garment-assets"
+MEDIA_TYPE = "model/gltf-binary"
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Content codings in order of preference
+ENCODINGS = ["br", "gzip"]
+
+
+def accepted_encodings(header):
+    """Content codings the Accept-Encoding header allows, mapped to their q-values"""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class AssetManifest:
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.assets = manifest["assets"]
+        # Hashed file name -> its level entry, for every level of every asset
+        self.files = {
+            level["file"]: level for entry in self.assets.values() for level in entry["levels"]
+        }
+
+    @classmethod
+    def load(cls, directory):
+        """The manifest written by asset_pipeline.py, or None if the assets were not built"""
+        path = os.path.join(directory, "manifest.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return cls(directory, json.load(f))
+
+    def level(self, name, lod):
+        levels = self.assets[name]["levels"]
+        return levels[max(0, min(lod, len(levels) - 1))]
+
+    def path(self, name, lod):
+        """Local path of an asset's level of detail"""
+        return os.path.join(self.directory, self.level(name, lod)["file"])
+
+    def url(self, name, lod):
+        return f"{URL_PREFIX}/{self.level(name, lod)['file']}"
+
+    def lightest_lod(self, name):
+        return len(self.assets[name]["levels"]) - 1
+
+    def representation(self, filename, accept_encoding):
+        """Path, content coding (None for identity) and strong ETag of the variant to send"""
+        level = self.files[filename]
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ENCODINGS:
+            if encoding in level["encodings"] and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                variant = level["encodings"][encoding]
+                return os.path.join(self.directory, variant["file"]), encoding, f'"{level["sha256"]}-{encoding}"'
+        return os.path.join(self.directory, filename), None, f'"{level["sha256"]}"'
+
+    def summary(self):
+        """URLs and sizes of every level, for clients choosing what to fetch"""
+        return {
+            name: [
+                {
+                    "lod": level["lod"],
+                    "url": f"{URL_PREFIX}/{level['file']}",
+                    "bytes": level["bytes"],
+                    "triangles": level["triangles"],
+                    "texture_size": level["texture_size"],
+                    "encoded_bytes": {encoding: variant["bytes"] for encoding, variant in level["encodings"].items()}
+                } for level in entry["levels"]
+            ] for name, entry in self.assets.items()
+        }
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+
+class ImmutableAssetMiddleware:
+    """
+    Pure ASGI middleware marking Gradio's file responses for content-hashed
+    asset files as immutable, so the 3D viewer's downloads are cached too
+    """
+
+    def __init__(self, app, filenames):
+        self.app = app
+        self.filenames = set(filenames)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "") if scope["type"] == "http" else ""
+        if "/file=" not in path or os.path.basename(unquote(path)) not in self.filenames:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cache_control(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = [(key, value) for key, value in message.get("headers", []) if key.lower() != b"cache-control"]
+                message = dict(message, headers=headers + [(b"cache-control", IMMUTABLE.encode())])
+            await send(message)
+
+        await self.app(scope, receive, send_with_cache_control)
+
+
+def add_asset_routes(api, manifest, default_lod=1):
+    """Serve the built assets, their stable redirect URLs and the manifest on a FastAPI app"""
+    from typing import Optional
+
+    from fastapi import HTTPException, Request
+    from fastapi.responses import FileResponse, JSONResponse, RedirectResponse, Response
+
+    @api.get(f"{URL_PREFIX}/manifest.json")
+    def asset_manifest_endpoint():
+        return JSONResponse(manifest.summary(), headers={"Cache-Control": "no-cache"})
+
+    @api.get(URL_PREFIX + "/{filename}")
+    def asset_endpoint(filename: str, request: Request, lod: Optional[int] = None):
+        if filename in manifest.files:
+            path, encoding, etag = manifest.representation(filename, request.headers.get("accept-encoding"))
+            headers = {"ETag": etag, "Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"}
+            if etag_matches(request.headers.get("if-none-match"), etag):
+                return Response(status_code=304, headers=headers)
+            if encoding is not None:
+                headers["Content-Encoding"] = encoding
+            return FileResponse(path, media_type=MEDIA_TYPE, headers=headers)
+
+        name, extension = os.path.splitext(filename)
+        if extension != ".glb" or name not in manifest.assets:
+            raise HTTPException(status_code=404, detail="Unknown asset")
+        # Stable name: redirect to the current hashed file of the chosen level of detail
+        if lod is None:
+            save_data = request.headers.get("save-data", "").lower() == "on"
+            mobile = request.headers.get("sec-ch-ua-mobile") == "?1"
+            lod = manifest.lightest_lod(name) if save_data or mobile else default_lod
+        return RedirectResponse(
+            manifest.url(name, lod), status_code=302,
+            headers={"Cache-Control": "no-cache", "Vary": "Save-Data, Sec-CH-UA-Mobile"}
+        )
+
+    api.add_middleware(ImmutableAssetMiddleware, filenames=manifest.files)
+    logger.info("Serving %s built 3D asset files under %s", len(manifest.files), URL_PREFIX)
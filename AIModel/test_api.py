@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def client(initialized_app):
+    return TestClient(initialized_app.create_api())
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/api/v1/shirt-measurements", {"height": 175, "weight": 70}),
+    ("/api/v1/pants-measurements", {"height": 175}),
+    ("/api/v1/shirt-sizes", {"chest": 90, "waist": 72, "shoulder": 41}),
+    ("/api/v1/pants-sizes", {"waist": 74, "leg_length": 99, "hips": 92}),
+    ("/api/v1/outfit", {"height": 175, "body_type": "slim"}),
+])
+def test_valid_requests_succeed(client, path, params):
+    response = client.get(path, params=params)
+    assert response.status_code == 200
+    assert "error" not in response.json()
+
+
+def test_predictions_match_the_predictor(client, initialized_app):
+    response = client.get("/api/v1/shirt-measurements", params={"height": 181.5})
+    assert response.json() == initialized_app.shirt_predictor.predict(181.5)
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/api/v1/shirt-measurements", {"height": -170}),
+    ("/api/v1/pants-measurements", {"height": 0}),
+    ("/api/v1/outfit", {"height": 175, "weight": "inf"}),
+    ("/api/v1/shirt-sizes", {"chest": 90, "waist": -1, "shoulder": 41}),
+    ("/api/v1/pants-sizes", {"waist": "nan", "leg_length": 99, "hips": 92}),
+])
+def test_invalid_input_is_a_bad_request(client, path, params):
+    response = client.get(path, params=params)
+    assert response.status_code == 400
+    assert response.json()["status"] == 400
+
+
+def test_missing_or_non_numeric_parameters_are_rejected_by_fastapi(client):
+    assert client.get("/api/v1/shirt-measurements").status_code == 422
+    assert client.get("/api/v1/shirt-measurements", params={"height": "tall"}).status_code == 422
+
+
+def test_internal_errors_are_server_errors(client, initialized_app, monkeypatch):
+    def broken(*args):
+        raise RuntimeError("model failure")
+
+    monkeypatch.setattr(initialized_app.shirt_predictor, "predict", broken)
+    response = client.get("/api/v1/shirt-measurements", params={"height": 175})
+    assert response.status_code == 500
+    assert response.json()["error"] == "model failure"
+
+
+def test_health_and_readiness(client, initialized_app, monkeypatch):
+    assert client.get("/healthz").json() == {"status": "ok"}
+    assert client.get("/readyz").json() == {"ready": True}
+    initialized_app._ready.clear()
+    monkeypatch.setitem(vars(initialized_app), "_init_error", "model store unavailable")
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json() == {"ready": False, "error": "model store unavailable"}
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from app import ShirtPredictor
+from conftest import trained
+from flat_forest import FlatForest
+
+
+@pytest.fixture(scope="module", params=[
+    ("per_column", "random_forest"), ("multi_output", "random_forest"), ("per_column", "extra_trees")
+], ids=lambda param: "-".join(param))
+def predictor(request):
+    layout, family = request.param
+    return trained(ShirtPredictor, layout=layout, family=family)
+
+
+def scaled_heights(predictor):
+    """Scaled heights on and right beside every split threshold, plus a spread of ordinary ones"""
+    thresholds = np.concatenate([
+        estimator.tree_.threshold[estimator.tree_.children_left != -1]
+        for model in predictor.models.values() for estimator in model.estimators_
+    ])
+    spread = predictor.scaler.transform(np.linspace(50, 300, 500).reshape(-1, 1)).ravel()
+    points = np.concatenate([thresholds, np.nextafter(thresholds, np.inf), np.nextafter(thresholds, -np.inf), spread])
+    return points.reshape(-1, 1)
+
+
+def test_flat_forests_predict_exactly_like_sklearn(predictor):
+    X = scaled_heights(predictor)
+    for name, model in predictor.models.items():
+        np.testing.assert_array_equal(FlatForest.from_forest(model).predict(X), model.predict(X), err_msg=name)
+
+
+def test_saved_flat_forests_load_unchanged(predictor, tmp_path):
+    X = scaled_heights(predictor)
+    for name, model in predictor.models.items():
+        flat = FlatForest.from_forest(model)
+        path = str(tmp_path / f"{name}.npz")
+        flat.save(path)
+        np.testing.assert_array_equal(FlatForest.load(path).predict(X), flat.predict(X), err_msg=name)
+
+
+def test_flattened_models_serve_the_same_predictions(predictor):
+    layout, params = predictor.model_set.layout, dict(predictor.model_set.params)
+    flattened = trained(ShirtPredictor, layout=layout, **params)
+    flattened.model_set.flatten()
+    assert all(isinstance(model, FlatForest) for model in flattened.models.values())
+
+    heights = np.linspace(50, 300, 501)
+    expected = predictor.predict_many(heights)
+    # Compiled from the flat forests as well
+    compiled = ShirtPredictor(model_set=flattened.model_set)
+    compiled.compile()
+    for candidate in [flattened, compiled]:
+        actual = candidate.predict_many(heights)
+        for col in predictor.columns:
+            np.testing.assert_array_equal(actual[col], expected[col], err_msg=col)
+        for height in heights[::50]:
+            assert candidate.predict(height) == predictor.predict(height)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from app import InvalidInput, PantsPredictor, ShirtPredictor, parse_heights
+from conftest import trained
+
+
+def heights_around_splits(predictor, count=100):
+    """Heights on both sides of the compiled table's split thresholds plus a spread of ordinary ones"""
+    table = predictor.lookup_table
+    thresholds = np.array(table.thresholds[::max(1, len(table.thresholds) // count)])
+    on_splits = thresholds * table.scale + table.mean
+    spread = np.linspace(120, 220, count)
+    return np.concatenate([on_splits - 1e-6, on_splits, on_splits + 1e-6, spread, [50.0, 300.0]])
+
+
+@pytest.fixture(scope="module", params=[ShirtPredictor, PantsPredictor], ids=["shirt", "pants"])
+def predictors(request):
+    forest = trained(request.param)
+    compiled = request.param(model_set=forest.model_set)
+    compiled.compile()
+    return forest, compiled
+
+
+def test_compiled_table_matches_forest(predictors):
+    forest, compiled = predictors
+    for height in heights_around_splits(compiled):
+        assert compiled.predict(height) == forest.predict(height), height
+
+
+def test_compiled_predict_many_matches_forest(predictors):
+    forest, compiled = predictors
+    heights = heights_around_splits(compiled)
+    expected, actual = forest.predict_many(heights), compiled.predict_many(heights)
+    for col in forest.columns:
+        np.testing.assert_array_equal(actual[col], expected[col])
+
+
+def test_predict_many_matches_predict(predictors):
+    for predictor in predictors:
+        heights = heights_around_splits(predictors[1])
+        many = predictor.predict_many(heights)
+        for i, height in enumerate(heights):
+            single = predictor.predict(height)[f"{predictor.name}_predictions"]
+            assert {col: many[col][i] for col in predictor.columns} == {
+                col: single[col]["value"] for col in predictor.columns
+            }, height
+
+
+def test_predict_many_of_no_heights_is_empty(predictors):
+    for predictor in predictors:
+        for output in ["columns", "dataframe"]:
+            assert len(predictor.predict_many([], output=output)["height"]) == 0
+
+
+def test_parse_heights_validates_every_height():
+    assert parse_heights("170, 180.5\n165").tolist() == [170.0, 180.5, 165.0]
+    assert parse_heights([170, "180"]).tolist() == [170.0, 180.0]
+    for heights in ["170, abc", "170 -5", [170, None], "nan"]:
+        with pytest.raises(InvalidInput):
+            parse_heights(heights)
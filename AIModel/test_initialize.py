@@ -0,0 +1,24 @@
+import threading
+
+import app
+
+
+def test_a_failed_initialization_is_reported_and_not_retried(monkeypatch):
+    calls = []
+
+    def unavailable_store(directory):
+        calls.append(directory)
+        raise OSError("model store unavailable")
+
+    monkeypatch.setitem(vars(app), "ModelStore", unavailable_store)
+    monkeypatch.setitem(vars(app), "_ready", threading.Event())
+    monkeypatch.setitem(vars(app), "_init_error", None)
+    # Globals initialize() assigns before the failure, removed again afterwards
+    for name in ["measurement_cache", "size_cache"]:
+        monkeypatch.setitem(vars(app), name, None)
+
+    for endpoint, args in [(app.shirt_measurements, (170,)), (app.outfit, (170,)), (app.brand_sizes, (90, 75, 42))]:
+        result = endpoint(*args)
+        assert result["status"] == 500 and "model store unavailable" in result["error"]
+    assert len(calls) == 1
+    assert app.readiness() == {"ready": False, "error": "model store unavailable"}
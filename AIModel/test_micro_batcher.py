@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import app
+from app import ShirtPredictor
+from conftest import trained
+from micro_batcher import MicroBatcher
+
+
+@pytest.fixture(scope="module")
+def predictor():
+    return trained(ShirtPredictor)
+
+
+def test_batched_predictions_equal_single_predictions(predictor):
+    batcher = MicroBatcher(predictor.predict_batch, window=0.005, max_batch_size=16)
+    requests = [(float(height), 70.0 if i % 2 else None, "slim" if i % 3 else None)
+                for i, height in enumerate(np.random.RandomState(0).uniform(150, 200, 100))]
+    with ThreadPoolExecutor(32) as pool:
+        results = list(pool.map(batcher.submit, requests))
+    assert results == [predictor.predict(*request) for request in requests]
+    # Concurrent callers really shared model calls
+    assert batcher.stats()["batches"] < len(requests)
+
+
+def test_predict_batch_equals_predict(predictor):
+    requests = [(height, None, None) for height in [150.0, 163.5, 171.2, 188.0, 205.0]]
+    assert predictor.predict_batch(requests) == [predictor.predict(*request) for request in requests]
+
+
+def test_compiled_predictors_bypass_the_batcher(predictor, monkeypatch):
+    compiled = ShirtPredictor(model_set=predictor.model_set)
+    compiled.compile()
+    # Any batched call would fail to find its batcher. Set through vars() so
+    # that reading the lazy attribute first does not initialize the app
+    monkeypatch.setitem(vars(app), "batchers", {})
+    monkeypatch.setitem(vars(app), "MICRO_BATCHING", True)
+    assert app.measure(compiled, 180.0, None, None) == predictor.predict(180.0)
+
+
+def test_idle_batcher_runs_a_lone_request_without_waiting():
+    batcher = MicroBatcher(lambda items: [item * 2 for item in items], window=0)
+    assert batcher.submit(21) == 42
+    assert batcher.stats() == {"batches": 1, "items": 1, "mean_batch_size": 1}
+
+
+def test_failed_batches_are_retried_one_by_one():
+    release = threading.Event()
+
+    def process(items):
+        # Hold the first batch so the others queue up behind it
+        release.wait()
+        if len(items) > 1 and "bad" in items:
+            raise ValueError("batch failed")
+        if items == ["bad"]:
+            raise KeyError("bad item")
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(process, window=0)
+    first = batcher.submit_future("first")
+    futures = [batcher.submit_future(item) for item in ["a", "bad", "b"]]
+    release.set()
+    assert first.result(timeout=5) == "FIRST"
+    assert futures[0].result(timeout=5) == "A"
+    assert futures[2].result(timeout=5) == "B"
+    with pytest.raises(KeyError):
+        futures[1].result(timeout=5)
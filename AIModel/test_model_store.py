@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+import app
+from app import MeasurementModels, ShirtPredictor
+from model_store import ModelStore, appended_since, data_checkpoint
+
+BASE_ROWS = 650
+
+
+@pytest.fixture
+def rows(repo_root):
+    with open(os.path.join(repo_root, app.CSV_PATH)) as f:
+        return f.read().splitlines(True)
+
+
+@pytest.fixture
+def data_path(tmp_path, rows, monkeypatch):
+    path = str(tmp_path / "data.csv")
+    with open(path, "w") as f:
+        f.writelines(rows[:BASE_ROWS + 1])
+    monkeypatch.setattr(app, "DATA_PATH", path)
+    return path
+
+
+@pytest.fixture
+def store(tmp_path, data_path):
+    """A store holding the models trained on the first rows of the data"""
+    store = ModelStore(str(tmp_path / "store"))
+    model_set().load_or_train(store)
+    return store
+
+
+def model_set():
+    models = MeasurementModels.shared([ShirtPredictor()])
+    models.params = {"n_estimators": 20, "random_state": 0}
+    return models
+
+
+def append(path, lines):
+    with open(path, "a") as f:
+        f.writelines(lines)
+
+
+def with_size(line, label):
+    fields = line.rstrip("\n").split(",")
+    fields[13] = label
+    return ",".join(fields) + "\n"
+
+
+def test_appended_rows_refresh_the_stored_models(store, data_path, rows, monkeypatch):
+    append(data_path, rows[BASE_ROWS + 1:])
+    models = model_set()
+    assert models.update(store.load_latest(models.name))
+    assert models.checkpoint["rows"] == len(rows) - 1
+    assert min(models.drift.values()) >= -app.MAX_ACCURACY_DRIFT
+
+    # load_or_train takes the same path and never retrains from scratch
+    def no_full_retrain(self, workers=None):
+        raise AssertionError("full retrain")
+    monkeypatch.setattr(MeasurementModels, "train", no_full_retrain)
+    model_set().load_or_train(store)
+
+
+def test_rewritten_rows_fall_back_to_a_full_retrain(store, data_path, rows):
+    with open(data_path, "w") as f:
+        f.writelines(rows[:1] + rows[2:BASE_ROWS + 2])
+    models = model_set()
+    assert not models.update(store.load_latest(models.name))
+
+
+def test_new_labels_fall_back_to_a_full_retrain(store, data_path, rows):
+    append(data_path, [with_size(rows[BASE_ROWS + 1], "XXXXXL")])
+    models = model_set()
+    assert not models.update(store.load_latest(models.name))
+
+
+def test_accuracy_drift_beyond_the_limit_falls_back_to_a_full_retrain(store, data_path, rows, monkeypatch):
+    append(data_path, rows[BASE_ROWS + 1:])
+    # Even an improvement counts as too much drift against a negative limit
+    monkeypatch.setattr(app, "MAX_ACCURACY_DRIFT", -1.0)
+    models = model_set()
+    assert not models.update(store.load_latest(models.name))
+
+
+def test_appended_since(tmp_path):
+    directory = tmp_path / "partitions"
+    directory.mkdir()
+    (directory / "a.csv").write_text("x\n1\n")
+    checkpoint = data_checkpoint(str(directory))
+
+    (directory / "a.csv").write_text("x\n1\n2\n")
+    (directory / "b.csv").write_text("x\n3\n")
+    assert appended_since(str(directory), checkpoint)
+
+    (directory / "a.csv").write_text("x\n9\n2\n")
+    assert not appended_since(str(directory), checkpoint)
+    (directory / "a.csv").write_text("x\n")
+    assert not appended_since(str(directory), checkpoint)
+    os.remove(directory / "a.csv")
+    assert not appended_since(str(directory), checkpoint)
@@ -0,0 +1,20 @@
+import pytest
+
+
+@pytest.mark.parametrize("height", [150, 165, 175.5, 190, 210])
+def test_outfit_always_ranks_sizes(initialized_app, height):
+    result = initialized_app.outfit(height)
+    assert "error" not in result
+    assert result["shirt"]["input"]["height"] == height
+    for garment in ["shirt_sizes", "pants_sizes"]:
+        sizes = result[garment]
+        assert sizes["brand_recommendations"] or sizes["closest_sizes"]
+        distances = [match["distance"] for match in sizes.get("closest_sizes", [])]
+        assert distances == sorted(distances)
+
+
+def test_outfit_matches_its_garment_predictions(initialized_app):
+    app = initialized_app
+    result = app.outfit(172, 68.5, "slim")
+    assert result["shirt"] == app.shirt_predictor.predict(172, 68.5, "slim")
+    assert result["pants"] == app.pants_predictor.predict(172, 68.5, "slim")
@@ -0,0 +1,96 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache, quantize
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResultCache(maxsize=2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    # Using "a" again leaves "b" as the least recently used
+    assert cache.get_or_compute("a", lambda: None) == 1
+    cache.get_or_compute("c", lambda: 3)
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+    assert cache.get_or_compute("c", lambda: None) == 3
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 2
+    assert stats["hits"] == 2 and stats["misses"] == 4
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResultCache(ttl=10)
+    cache.get_or_compute("a", lambda: 1)
+    clock.now = 9.9
+    assert cache.get_or_compute("a", lambda: 2) == 1
+    clock.now = 10.0
+    assert cache.get_or_compute("a", lambda: 2) == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_failures_are_not_cached():
+    cache = ResultCache()
+
+    def fail():
+        raise ValueError("no result")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("a", fail)
+    assert cache.get_or_compute("a", lambda: 1) == 1
+
+
+def test_a_disabled_cache_always_computes():
+    cache = ResultCache(maxsize=0)
+    cache.get_or_compute("a", lambda: 1)
+    assert cache.get_or_compute("a", lambda: 2) == 2
+    assert cache.stats()["size"] == 0
+
+
+def test_results_computed_across_a_clear_are_not_stored():
+    cache = ResultCache()
+    computing, cleared = threading.Event(), threading.Event()
+
+    def stale():
+        computing.set()
+        cleared.wait(5)
+        return "computed with the old models"
+
+    thread = threading.Thread(target=cache.get_or_compute, args=("a", stale))
+    thread.start()
+    computing.wait(5)
+    cache.clear()
+    cleared.set()
+    thread.join(5)
+    assert cache.stats()["size"] == 0
+    assert cache.get_or_compute("a", lambda: "fresh") == "fresh"
+
+
+def test_quantize_snaps_values_on_the_grid_only():
+    assert quantize(170, 1) == 170.0
+    assert quantize(70.10000000000001, 0.1) == 70.1
+    assert quantize(91.49999999999999, 0.5) == 91.5
+    # Values off the grid give different results, so they keep their own entries
+    assert quantize(133.4, 1) == 133.4
+    assert quantize(91.2, 0.5) == 91.2
+    assert quantize(None, 0.1, optional=True) is None
+    with pytest.raises(TypeError):
+        quantize(None, 1)
+
@@ -0,0 +1,59 @@
+import json
+import shutil
+
+import pytest
+
+from app import PANTS_SIZE_CHARTS_PATH, SHIRT_SIZE_CHARTS_PATH, BrandSizePredictor, PantsSizePredictor
+
+
+@pytest.fixture(params=[
+    (BrandSizePredictor, SHIRT_SIZE_CHARTS_PATH), (PantsSizePredictor, PANTS_SIZE_CHARTS_PATH)
+], ids=["shirt", "pants"])
+def predictor(request, tmp_path):
+    """A predictor reading a copy of the repository's charts, free to be rewritten"""
+    predictor_cls, charts_path = request.param
+    path = str(tmp_path / "charts.json")
+    shutil.copy(charts_path, path)
+    return predictor_cls(path)
+
+
+def test_a_malformed_reload_keeps_the_loaded_charts(predictor):
+    charts = predictor.brand_charts
+    notified = []
+    predictor.listeners.append(lambda: notified.append(True))
+    with open(predictor.size_charts_path, "w") as f:
+        f.write('[{"brand": "Half written"')
+    predictor.reload()
+    assert predictor.brand_charts == charts and not notified
+
+    changed = charts[:1]
+    with open(predictor.size_charts_path, "w") as f:
+        json.dump(changed, f)
+    predictor.reload()
+    assert predictor.brand_charts == changed and notified == [True]
+
+
+@pytest.mark.parametrize("predictor_cls", [BrandSizePredictor, PantsSizePredictor], ids=["shirt", "pants"])
+def test_a_malformed_first_load_raises(predictor_cls, tmp_path):
+    path = tmp_path / "charts.json"
+    path.write_text("not json")
+    with pytest.raises(ValueError):
+        predictor_cls(str(path))
+
+
+def test_matches_are_grouped_by_brand_in_chart_order(predictor):
+    sizes = [(brand["brand"], size) for brand in predictor.brand_charts for size in brand["sizes"]]
+    brand, size = sizes[len(sizes) // 2]
+    measurements = {dim: sum(size[dim]) / 2 for dim in predictor.dimensions}
+    results = predictor.find_matching_sizes(measurements)
+    matched = [
+        (recommendation["brand"], match["size"])
+        for recommendation in results["brand_recommendations"] for match in recommendation["matching_sizes"]
+    ]
+    assert (brand, size["label"]) in matched
+    expected = [
+        (name, chart_size["label"]) for name, chart_size in sizes
+        if all(chart_size[dim][0] - predictor.tolerance <= measurements[dim] <= chart_size[dim][1] + predictor.tolerance
+               for dim in predictor.dimensions)
+    ]
+    assert matched == expected
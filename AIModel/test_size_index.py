@@ -0,0 +1,181 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from size_index import (
+    COMPILED_SUFFIX, FIT_OUTSIDE, FIT_PERFECT, FIT_TOLERANCE, SizeChartIndex, load_size_index
+)
+
+DIMENSIONS = ["chest", "waist", "shoulder"]
+LABELS = ["XS", "S", "M", "L", "XL", "XXL"]
+
+
+def random_charts(brands, seed=0):
+    """Charts with overlapping, shifted ranges; some bounds are ints, as in hand-written charts"""
+    rng = np.random.RandomState(seed)
+    charts = []
+    for b in range(brands):
+        sizes = []
+        for i, label in enumerate(LABELS[:rng.randint(3, len(LABELS) + 1)]):
+            size = {"label": label}
+            for d, dim in enumerate(DIMENSIONS):
+                low = 80 + 10 * d + 4 * i + rng.uniform(-3, 3)
+                high = low + rng.uniform(2, 6)
+                size[dim] = [int(low), int(high) + 1] if rng.rand() < 0.3 else [round(low, 1), round(high, 1)]
+            sizes.append(size)
+        charts.append({"brand": f"Brand {b}", "sizes": sizes})
+    return charts
+
+
+def chart_sizes(charts):
+    return [size for brand in charts for size in brand["sizes"]]
+
+
+def brute_force_matches(charts, point, tolerance=0):
+    """Positions of every size containing the point, checked one by one in chart order"""
+    return [
+        position for position, size in enumerate(chart_sizes(charts))
+        if all(size[dim][0] - tolerance <= value <= size[dim][1] + tolerance for dim, value in zip(DIMENSIONS, point))
+    ]
+
+
+def random_points(count, seed=1):
+    rng = np.random.RandomState(seed)
+    centre = np.array([90.0, 100.0, 110.0])
+    return centre + rng.normal(0, 12, (count, len(DIMENSIONS)))
+
+
+@pytest.fixture(scope="module", params=[0, 2], ids=["exact", "tolerance"])
+def tolerance(request):
+    return request.param
+
+
+@pytest.fixture(scope="module")
+def charts():
+    return random_charts(60)
+
+
+def test_query_matches_brute_force(charts, tolerance):
+    index = SizeChartIndex(charts, DIMENSIONS, tolerance)
+    points = random_points(500)
+    # Points exactly on chart bounds as well
+    bounds = np.array([[size[dim][i] for dim in DIMENSIONS] for size in chart_sizes(charts)[:50] for i in (0, 1)])
+    for point in np.concatenate([points, bounds]):
+        assert index.query(point).tolist() == brute_force_matches(charts, point, tolerance)
+
+
+def test_match_many_and_pairs_match_brute_force(charts, tolerance):
+    index = SizeChartIndex(charts, DIMENSIONS, tolerance)
+    points = random_points(200)
+    mask, codes = index.match_many(points)
+    rows, positions, pair_codes = index.match_pairs(points)
+    sizes = chart_sizes(charts)
+    for row, point in enumerate(points):
+        expected = brute_force_matches(charts, point, tolerance)
+        assert np.flatnonzero(mask[row]).tolist() == expected
+        assert positions[rows == row].tolist() == expected
+        for position in expected:
+            for d, dim in enumerate(DIMENSIONS):
+                low, high = sizes[position][dim]
+                code = FIT_PERFECT if low <= point[d] <= high else FIT_TOLERANCE
+                assert codes[row, position, d] == code
+        outside = [position for position in range(len(sizes)) if position not in expected]
+        assert all((codes[row, position] == FIT_OUTSIDE).any() for position in outside)
+
+
+def test_points_outside_every_chart_match_nothing(charts):
+    index = SizeChartIndex(charts, DIMENSIONS)
+    for point in [[0, 0, 0], [500, 500, 500], [np.nan, 100, 110], [np.inf, 100, 110]]:
+        assert len(index.query(point)) == 0
+
+
+def test_empty_charts():
+    index = SizeChartIndex([], DIMENSIONS)
+    assert len(index.query([90, 100, 110])) == 0
+    assert index.match_pairs(random_points(3))[0].tolist() == []
+
+
+def brute_force_distances(charts, point, weights):
+    """Weighted distance from the point to every size's chart ranges (the match tolerance is not used)"""
+    distances = []
+    for size in chart_sizes(charts):
+        offsets = [value - min(max(value, size[dim][0]), size[dim][1]) for dim, value in zip(DIMENSIONS, point)]
+        distances.append(np.sqrt(sum((offset * weight) ** 2 for offset, weight in zip(offsets, weights))))
+    return np.array(distances)
+
+
+@pytest.mark.parametrize("k", [1, 3, 10])
+@pytest.mark.parametrize("weights", [None, [2.0, 1.0, 0.5]], ids=["unweighted", "weighted"])
+def test_nearest_matches_brute_force(charts, tolerance, k, weights):
+    index = SizeChartIndex(charts, DIMENSIONS, tolerance)
+    for point in random_points(200, seed=2) * 1.2:
+        positions, distances = index.nearest(point, k, weights)
+        expected = brute_force_distances(charts, point, weights or [1.0] * len(DIMENSIONS))
+        np.testing.assert_allclose(distances, np.sort(expected)[:k])
+        # Sizes at the same distance may come in either order, but must be at that distance
+        np.testing.assert_allclose(expected[positions], distances)
+        assert len(set(positions.tolist())) == len(positions)
+
+
+def test_nearest_of_a_point_inside_a_size_is_at_distance_zero(charts):
+    index = SizeChartIndex(charts, DIMENSIONS)
+    size = chart_sizes(charts)[7]
+    point = [sum(size[dim]) / 2 for dim in DIMENSIONS]
+    containing = index.query(point)
+    positions, distances = index.nearest(point, len(containing) + 1)
+    assert sorted(positions[:len(containing)].tolist()) == containing.tolist()
+    assert (distances[:len(containing)] == 0).all() and distances[-1] > 0
+
+
+def write_charts(path, charts):
+    with open(path, "w") as f:
+        json.dump(charts, f)
+
+
+def test_compiled_index_round_trips(tmp_path, charts, tolerance):
+    index = SizeChartIndex(charts, DIMENSIONS, tolerance)
+    path = str(tmp_path / f"charts{COMPILED_SUFFIX}")
+    index.save(path)
+    loaded = SizeChartIndex.load(path)
+
+    assert loaded.charts() == charts
+    assert loaded.dimensions == DIMENSIONS and loaded.tolerance == tolerance
+    assert list(loaded.brands) == index.brands
+    for position in range(len(index)):
+        assert loaded.sizes[position] == index.sizes[position]
+    for point in random_points(200):
+        assert loaded.query(point).tolist() == index.query(point).tolist()
+        for got, expected in zip(loaded.nearest(point, 5), index.nearest(point, 5)):
+            np.testing.assert_array_equal(got, expected)
+    for got, expected in zip(loaded.match_pairs(random_points(50)), index.match_pairs(random_points(50))):
+        np.testing.assert_array_equal(got, expected)
+
+
+def test_load_size_index_uses_a_current_compiled_copy_only(tmp_path, charts):
+    path = str(tmp_path / "charts.json")
+    write_charts(path, charts)
+    assert load_size_index(path, DIMENSIONS, compile=False)._charts is not None
+    assert not os.path.exists(path + COMPILED_SUFFIX)
+
+    load_size_index(path, DIMENSIONS)
+    assert os.path.exists(path + COMPILED_SUFFIX)
+    # Served from the compiled copy, which carries no parsed charts
+    assert load_size_index(path, DIMENSIONS)._charts is None
+    # A different tolerance or changed charts are parsed again
+    assert load_size_index(path, DIMENSIONS, tolerance=2)._charts is not None
+    changed = random_charts(5, seed=3)
+    write_charts(path, changed)
+    os.utime(path, ns=(0, 0))
+    reloaded = load_size_index(path, DIMENSIONS)
+    assert reloaded._charts is not None and reloaded.charts() == changed
+    assert load_size_index(path, DIMENSIONS).charts() == changed
+
+
+def test_load_rejects_files_that_are_not_compiled_indexes(tmp_path):
+    path = str(tmp_path / f"broken{COMPILED_SUFFIX}")
+    with open(path, "wb") as f:
+        f.write(b"not an index")
+    with pytest.raises(ValueError):
+        SizeChartIndex.load(path)
@@ -0,0 +1,141 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from static_assets import IMMUTABLE, URL_PREFIX, AssetManifest, accepted_encodings, add_asset_routes
+
+
+def write_level(directory, name, lod, encodings):
+    """One level of detail written as small fake files, with the manifest entry asset_pipeline.py gives it"""
+    content = f"{name} level {lod}".encode()
+    sha = f"{lod:02d}{name}" * 4
+    level = {
+        "file": f"{name}.lod{lod}.{sha[:8]}.glb", "sha256": sha, "lod": lod, "bytes": len(content),
+        "triangles": 1000 // (lod + 1), "texture_size": 1024 >> lod, "encodings": {}
+    }
+    (directory / level["file"]).write_bytes(content)
+    for encoding in encodings:
+        variant = f"{level['file']}.{encoding}"
+        (directory / variant).write_bytes(f"{encoding}:".encode() + content)
+        level["encodings"][encoding] = {"file": variant, "bytes": len(content) + len(encoding) + 1}
+    return level
+
+
+@pytest.fixture
+def manifest(tmp_path):
+    assets = {"jacket": {"levels": [
+        write_level(tmp_path, "jacket", 0, ["br", "gzip"]),
+        write_level(tmp_path, "jacket", 1, ["gzip"]),
+        write_level(tmp_path, "jacket", 2, [])
+    ]}}
+    (tmp_path / "manifest.json").write_text(json.dumps({"assets": assets}))
+    # In the build directory, but not a built asset
+    (tmp_path / "notes.txt").write_text("not served")
+    return AssetManifest.load(str(tmp_path))
+
+
+@pytest.fixture
+def client(manifest):
+    api = FastAPI()
+    add_asset_routes(api, manifest, default_lod=1)
+    return TestClient(api, follow_redirects=False)
+
+
+def asset_url(manifest, lod):
+    return manifest.url("jacket", lod)
+
+
+def get_raw(client, url, **headers):
+    """Response body as sent, without httpx undoing the content coding"""
+    with client.stream("GET", url, headers=headers) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_files_carry_a_strong_etag_and_immutable_caching(client, manifest):
+    level = manifest.level("jacket", 2)
+    response, body = get_raw(client, asset_url(manifest, 2))
+    assert response.status_code == 200 and body == b"jacket level 2"
+    assert response.headers["etag"] == f'"{level["sha256"]}"'
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert response.headers["content-type"] == "model/gltf-binary"
+
+
+def test_a_matching_if_none_match_is_not_modified(client, manifest):
+    url = asset_url(manifest, 2)
+    etag = client.get(url).headers["etag"]
+    for header in [etag, f'"other", {etag}', "*"]:
+        response = client.get(url, headers={"If-None-Match": header})
+        assert response.status_code == 304 and response.content == b""
+        assert response.headers["etag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+@pytest.mark.parametrize("accept_encoding, lod, expected", [
+    ("br, gzip", 0, "br"),
+    ("gzip, br;q=0", 0, "gzip"),
+    ("*", 0, "br"),
+    ("identity", 0, None),
+    ("br, gzip", 1, "gzip"),
+    ("br", 1, None),
+    ("br, gzip", 2, None),
+])
+def test_encoding_negotiation(client, manifest, accept_encoding, lod, expected):
+    response, body = get_raw(client, asset_url(manifest, lod), **{"Accept-Encoding": accept_encoding})
+    assert response.headers.get("content-encoding") == expected
+    assert response.headers["vary"] == "Accept-Encoding"
+    level = manifest.level("jacket", lod)
+    prefix = f"{expected}:".encode() if expected else b""
+    assert body == prefix + f"jacket level {lod}".encode()
+    assert response.headers["etag"] == (f'"{level["sha256"]}-{expected}"' if expected else f'"{level["sha256"]}"')
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip;q=0.5, BR, deflate;q=bad") == {"gzip": 0.5, "br": 1.0, "deflate": 0.0}
+    assert accepted_encodings(None) == {}
+
+
+@pytest.mark.parametrize("query, headers, lod", [
+    ("", {}, 1),
+    ("?lod=0", {}, 0),
+    ("?lod=9", {}, 2),
+    ("", {"Save-Data": "on"}, 2),
+    ("", {"Sec-CH-UA-Mobile": "?1"}, 2),
+    ("?lod=0", {"Save-Data": "on"}, 0),
+])
+def test_stable_names_redirect_to_the_hashed_file(client, manifest, query, headers, lod):
+    response = client.get(f"{URL_PREFIX}/jacket.glb{query}", headers=headers)
+    assert response.status_code == 302
+    assert response.headers["location"] == asset_url(manifest, lod)
+    assert response.headers["cache-control"] == "no-cache"
+
+
+@pytest.mark.parametrize("path", [
+    "notes.txt", "manifest.json.bak", "pants.glb", "jacket.gltf",
+    "..%2Fmanifest.json", "..%2F..%2Fapp.py", "%2e%2e%2fnotes.txt", "%2Fetc%2Fpasswd"
+])
+def test_only_built_assets_are_served(client, path):
+    assert client.get(f"{URL_PREFIX}/{path}").status_code == 404
+
+
+def test_manifest_lists_every_level(client, manifest):
+    response = client.get(f"{URL_PREFIX}/manifest.json")
+    assert response.headers["cache-control"] == "no-cache"
+    levels = response.json()["jacket"]
+    assert [level["url"] for level in levels] == [asset_url(manifest, lod) for lod in range(3)]
+    assert levels[0]["encoded_bytes"].keys() == {"br", "gzip"}
+
+
+def test_middleware_marks_gradio_file_responses_immutable(manifest):
+    api = FastAPI()
+    filename = manifest.level("jacket", 1)["file"]
+
+    @api.get("/file={path:path}")
+    def gradio_file(path: str):
+        return {"path": path}
+
+    add_asset_routes(api, manifest)
+    client = TestClient(api)
+    assert client.get(f"/file=/tmp/gradio/{filename}").headers["cache-control"] == IMMUTABLE
+    assert "cache-control" not in client.get("/file=/tmp/gradio/other.glb").headers
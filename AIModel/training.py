@@ -0,0 +1,138 @@
+"""
+Training workers for the measurement models
+
+Every target is fitted by fit_target(), which only needs the scaled
+features and the target values, so independent targets can be trained
+concurrently in a process pool while each forest also builds its trees on
+several threads. evaluate_fold() scores one held-out fold the same way for
+the cross-validation sweep in evaluate_models.py. This module deliberately
+avoids importing app.py so pool workers start without loading the Gradio
+interface.
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import (
+    ExtraTreesClassifier, ExtraTreesRegressor, RandomForestClassifier, RandomForestRegressor
+)
+from sklearn.metrics import r2_score, accuracy_score
+
+from flat_forest import model_memory
+
+# Forest families selectable with the "family" parameter: (classifier, regressor).
+# Both keep sklearn's forest structure, so FlatForest and tree replacement work with either.
+FAMILIES = {
+    "random_forest": (RandomForestClassifier, RandomForestRegressor),
+    "extra_trees": (ExtraTreesClassifier, ExtraTreesRegressor)
+}
+
+
+def process_pool(workers):
+    """
+    Process pool for fitting. Workers are spawned rather than forked because
+    training also runs on background threads of a live server (hot reloads),
+    and a forked child can inherit locks those other threads were holding.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def make_forest(kind, params):
+    """Unfitted forest of the kind and params; params may name a "family" (default random_forest)"""
+    params = dict(params)
+    classifier, regressor = FAMILIES[params.pop("family", "random_forest")]
+    return classifier(**params) if kind == "classifier" else regressor(**params)
+
+
+def fit_target(kind, X, y, params):
+    """Fit one forest; returns (model, training-set score per output column, seconds)"""
+    start = time.perf_counter()
+    model = make_forest(kind, params)
+    model.fit(X, y)
+    scores = score_target(kind, model, X, y)
+
+    # Tree building threads only pay off during fit; single-row predicts are faster without them
+    model.set_params(n_jobs=None)
+    return model, scores, time.perf_counter() - start
+
+
+def score_target(kind, model, X, y):
+    """Accuracy (classifier) or R² (regressor) of a fitted forest on (X, y), one per output column"""
+    score = accuracy_score if kind == "classifier" else r2_score
+    predictions = model.predict(X)
+    if np.ndim(y) == 1:
+        return [round(score(y, predictions), 4)]
+    return [round(score(y[:, i], predictions[:, i]), 4) for i in range(y.shape[1])]
+
+
+def replace_trees(kind, model, X, y, count, seed, n_jobs=None):
+    """
+    Refit the `count` oldest trees of a fitted forest on (X, y), keeping the
+    rest; returns the same (model, scores, seconds) as fit_target(). The new
+    trees draw their bootstrap samples from `seed` so repeated refreshes do
+    not reuse the seeds of the trees they keep.
+    """
+    start = time.perf_counter()
+    count = min(count, model.n_estimators)
+    random_state = model.random_state
+    model.estimators_ = model.estimators_[count:]
+    model.set_params(warm_start=True, random_state=seed, n_jobs=n_jobs)
+    model.fit(X, y)
+    model.set_params(warm_start=False, random_state=random_state, n_jobs=None)
+    return model, score_target(kind, model, X, y), time.perf_counter() - start
+
+
+def fit_targets(jobs, params, workers=1):
+    """
+    Fit independent forests within a budget of worker CPUs.
+    jobs maps a model name to (kind, X, y); returns name -> fit_target() result.
+    """
+    workers = max(1, workers)
+    processes = min(workers, len(jobs))
+    params = dict(params, n_jobs=max(1, workers // max(1, processes)))
+
+    if processes <= 1:
+        return {
+            name: fit_target(kind, X, y, params)
+            for name, (kind, X, y) in jobs.items()
+        }
+
+    with process_pool(processes) as pool:
+        futures = {
+            name: pool.submit(fit_target, kind, X, y, params)
+            for name, (kind, X, y) in jobs.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+def evaluate_fold(kind, X, y, train_index, test_index, params, latency_rows=50):
+    """
+    Fit one forest on the training rows of a fold and measure it on the
+    held-out rows: score per output column, fit seconds, median single-row
+    predict latency, batch predict time per row and serialized size.
+    """
+    model = make_forest(kind, dict(params, n_jobs=None))
+    start = time.perf_counter()
+    model.fit(X[train_index], y[train_index])
+    fit_seconds = time.perf_counter() - start
+    X_test, y_test = X[test_index], y[test_index]
+
+    start = time.perf_counter()
+    model.predict(X_test)
+    batch_seconds = time.perf_counter() - start
+
+    latencies = []
+    for row in X_test[:latency_rows]:
+        start = time.perf_counter()
+        model.predict(row.reshape(1, -1))
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "scores": score_target(kind, model, X_test, y_test),
+        "fit_seconds": fit_seconds,
+        "latency_ms": float(np.median(latencies)) * 1000,
+        "batch_us_per_row": batch_seconds / len(test_index) * 1e6,
+        "bytes": model_memory(model)["bytes"]
+    }
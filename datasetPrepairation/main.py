@@ -1,9 +1,33 @@
 from datasets import load_dataset
+import glob
+import numpy as np
+import os
 import pandas as pd
 from sklearn.preprocessing import LabelEncoder
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 
+RAW_DATASET_PATH = "./datasetPrepairation/rawDatasets/bdm.csv"
+PROCESSED_CSV_PATH = "./datasetPrepairation/processedDatasets/bdm.csv"
+PROCESSED_PARQUET_DIR = "./datasetPrepairation/processedDatasets/bdm.parquet"
+
+# "batched" converts and enriches whole batches with column-wise operations;
+# "rows" keeps the original one-example-at-a-time map;
+# "streaming" processes the raw CSV chunk by chunk into partitioned Parquet
+PREP_MODE = os.environ.get("PREP_MODE", "batched")
+# Rows per batch handed to each map call in batched mode, and per chunk in streaming mode
+BATCH_SIZE = int(os.environ.get("PREP_BATCH_SIZE", "10000"))
+# Worker processes for dataset.map; 1 keeps everything in this process
+NUM_PROC = int(os.environ.get("PREP_NUM_PROC", str(os.cpu_count() or 1)))
+# Streaming mode also appends every chunk to PROCESSED_CSV_PATH when set to 1
+EXPORT_CSV = os.environ.get("PREP_EXPORT_CSV", "0") == "1"
+
+# Raw measurements recorded in inches
+MEASUREMENT_COLUMNS = [
+    "ShoulderWidth", "ChestWidth", "Belly", "Waist", "Hips", "ArmLength",
+    "WaistToKnee", "ShoulderToWaist", "LegLength", "HeadCircumference", "TotalHeight"
+]
+
 
 # Load dataset
 df = pd.read_csv("datasetPrepairation/rawDatasets/Clothes-Size-Prediction.csv")  # Update with the actual filename
@@ -38,20 +62,31 @@ def predict_weight_size(age, height):
     size_label = le.inverse_transform([int(size_pred)])[0]
     return round(weight_pred, 2), size_label  # Removed rounding on size_label since it's categorical
 
-# Load dataset
-dataset = load_dataset(
-    "csv", data_files="./datasetPrepairation/rawDatasets/bdm.csv", split="train"
-)
+# Batched prediction: one predict call per model for a whole batch
+def predict_weight_size_batch(ages, heights):
+    X = np.column_stack([ages, heights])
+    weight_preds = np.round(weight_model.predict(X), 2)
+    size_labels = le.inverse_transform(size_model.predict(X).astype(int))
+    return weight_preds, size_labels
+
+# Map predicted sizes to fits
+def fit_for_sizes(size_labels):
+    return np.where(
+        np.isin(size_labels, ["XXS", "XS"]), "Slim",
+        np.where(np.isin(size_labels, ["S", "M"]), "Regular", "Loose")
+    )
 
 # Convert measurements to cm
 def convert_to_cm(example):
-    for key in [
-        "ShoulderWidth", "ChestWidth", "Belly", "Waist", "Hips", "ArmLength",
-        "WaistToKnee", "ShoulderToWaist", "LegLength", "HeadCircumference", "TotalHeight"
-    ]:
+    for key in MEASUREMENT_COLUMNS:
         example[key] = round(example[key] * 2.54, 2)
     return example
 
+def convert_to_cm_batch(batch):
+    for key in MEASUREMENT_COLUMNS:
+        batch[key] = np.round(np.asarray(batch[key], dtype=float) * 2.54, 2)
+    return batch
+
 def add_weight_height(example):
     res = list(predict_weight_size(example["Age"], example["TotalHeight"]))
     example["Size"] = res[1]
@@ -66,14 +101,65 @@ def add_weight_height(example):
     example["Fit"] = res[1]
     return example
 
-# Apply transformations
-dataset = dataset.map(convert_to_cm)
-dataset = dataset.map(add_weight_height)
-
-# Convert dataset to pandas dataframe
-dataset = dataset.to_pandas()
-
-# Save dataset to CSV
-dataset.to_csv("./datasetPrepairation/processedDatasets/bdm.csv", index=False)
-
-print(dataset)
+def add_weight_height_batch(batch):
+    weights, sizes = predict_weight_size_batch(batch["Age"], batch["TotalHeight"])
+    batch["Size"] = sizes
+    batch["Weight"] = weights
+    batch["Fit"] = fit_for_sizes(sizes)
+    return batch
+
+def prepare_batch(batch):
+    return add_weight_height_batch(convert_to_cm_batch(batch))
+
+# Streaming preparation: memory is bounded by one chunk whatever the input size
+def prepare_streaming(raw_path, parquet_dir, csv_path=None, chunk_size=BATCH_SIZE):
+    os.makedirs(parquet_dir, exist_ok=True)
+    # Drop partitions from an earlier, possibly longer run
+    for path in glob.glob(os.path.join(parquet_dir, "part-*.parquet")):
+        os.remove(path)
+    if csv_path and os.path.exists(csv_path):
+        os.remove(csv_path)
+
+    rows = 0
+    chunks = pd.read_csv(
+        raw_path, chunksize=chunk_size, dtype={key: float for key in MEASUREMENT_COLUMNS}
+    )
+    for part, chunk in enumerate(chunks):
+        chunk = prepare_batch(chunk)
+        chunk.to_parquet(os.path.join(parquet_dir, f"part-{part:05d}.parquet"), index=False)
+        if csv_path:
+            chunk.to_csv(csv_path, mode="a", header=(part == 0), index=False)
+        rows += len(chunk)
+    return rows
+
+if __name__ == "__main__":
+    if PREP_MODE == "streaming":
+        rows = prepare_streaming(
+            RAW_DATASET_PATH, PROCESSED_PARQUET_DIR, PROCESSED_CSV_PATH if EXPORT_CSV else None
+        )
+        print(f"Wrote {rows} rows to {PROCESSED_PARQUET_DIR}")
+    else:
+        # Load dataset
+        dataset = load_dataset(
+            "csv", data_files=RAW_DATASET_PATH, split="train"
+        )
+
+        # Apply transformations
+        if PREP_MODE == "rows":
+            dataset = dataset.map(convert_to_cm)
+            dataset = dataset.map(add_weight_height)
+        else:
+            dataset = dataset.map(
+                prepare_batch,
+                batched=True,
+                batch_size=BATCH_SIZE,
+                num_proc=NUM_PROC if NUM_PROC > 1 else None
+            )
+
+        # Convert dataset to pandas dataframe
+        dataset = dataset.to_pandas()
+
+        # Save dataset to CSV
+        dataset.to_csv(PROCESSED_CSV_PATH, index=False)
+
+        print(dataset)